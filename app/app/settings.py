@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # rest framework stuff
     "rest_framework",
     "rest_framework.authtoken",
@@ -80,17 +82,61 @@ WSGI_APPLICATION = "app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# DB_POOL=1 checks connections out of a per-process pool (see
+# core.db.backends.postgresql_pool); otherwise connections are kept open
+# for DB_CONN_MAX_AGE seconds between requests.
+DB_POOL = os.environ.get("DB_POOL", "0") == "1"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "core.db.backends.postgresql_pool"
+            if DB_POOL
+            else "django.db.backends.postgresql"
+        ),
         "HOST": os.environ.get("DB_HOST"),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASSWORD"),
+        # pooled connections go back to the pool at the end of each request
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "POOL": {
+            "MIN_SIZE": int(os.environ.get("DB_POOL_MIN_SIZE", 1)),
+            "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "MAX_LIFETIME": int(os.environ.get("DB_POOL_MAX_LIFETIME", 3600)),
+            "TIMEOUT": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+            "CHECK": os.environ.get("DB_POOL_CHECK", "1") == "1",
+            "STATS_INTERVAL": int(os.environ.get("DB_POOL_STATS_INTERVAL", 60)),
+        },
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# Per-user list responses (recipe.mixins.CachedListMixin). The local memory
+# default is per process; point RECIPE_CACHE_BACKEND at a shared backend
+# such as memcached when running several workers.
+
+RECIPE_CACHE_BACKEND = os.environ.get(
+    "RECIPE_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "recipe_lists": {
+        "BACKEND": RECIPE_CACHE_BACKEND,
+        "LOCATION": os.environ.get("RECIPE_CACHE_LOCATION", "recipe-lists"),
+    },
+}
+
+if RECIPE_CACHE_BACKEND.endswith("LocMemCache"):
+    CACHES["recipe_lists"]["OPTIONS"] = {"MAX_ENTRIES": 10000}
+
+RECIPE_LIST_CACHE = "recipe_lists"
+RECIPE_LIST_CACHE_TIMEOUT = int(os.environ.get("RECIPE_LIST_CACHE_TIMEOUT", 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -104,6 +150,36 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing (see core.passwords and core.authentication). New
+# passwords use the first hasher in the list; by default Argon2 or bcrypt
+# when argon2-cffi or bcrypt is installed, else PBKDF2. Hashes made by the
+# others still verify and are replaced on the next login. Hashing runs on
+# a per-process pool of PASSWORD_HASH_WORKERS threads with
+# PASSWORD_HASH_QUEUE waiting callers; beyond that logins wait
+# PASSWORD_HASH_WAIT seconds, then the API answers with a 429.
+
+PASSWORD_HASHERS = [
+    hasher
+    for hasher, library in (
+        ("django.contrib.auth.hashers.Argon2PasswordHasher", "argon2"),
+        ("django.contrib.auth.hashers.BCryptSHA256PasswordHasher", "bcrypt"),
+        ("django.contrib.auth.hashers.PBKDF2PasswordHasher", None),
+        ("django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher", None),
+    )
+    if library is None or find_spec(library) is not None
+]
+if os.environ.get("PASSWORD_HASHERS"):
+    PASSWORD_HASHERS = os.environ["PASSWORD_HASHERS"].split(",")
+
+AUTHENTICATION_BACKENDS = ["core.authentication.PooledModelBackend"]
+
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+)
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 64))
+PASSWORD_HASH_WAIT = float(os.environ.get("PASSWORD_HASH_WAIT", 5))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 
@@ -127,6 +203,70 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = "vol/web/media"
 STATIC_ROOT = "vol/web/static"
 
+# core.views.serve_media hands media transfers to the front proxy: nginx
+# with X-Accel-Redirect to an internal location mapped to MEDIA_ROOT, or
+# Apache/lighttpd with X-Sendfile. Without either the file is streamed.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE") == "1"
+MEDIA_CACHE_MAX_AGE = int(os.environ.get("MEDIA_CACHE_MAX_AGE", 3600))
+
+# Thumbnails and webp variants of recipe images are built by a thread pool
+# after the upload is committed; eager mode builds them inside the request.
+RECIPE_IMAGE_WORKERS = int(os.environ.get("RECIPE_IMAGE_WORKERS", 2))
+RECIPE_IMAGE_PROCESS_EAGER = os.environ.get("RECIPE_IMAGE_PROCESS_EAGER") == "1"
+# name recipe images by their sha256 so identical uploads share one file
+RECIPE_IMAGE_CONTENT_ADDRESSED = os.environ.get("RECIPE_IMAGE_CONTENT_ADDRESSED") == "1"
+# uploads are streamed to MEDIA_ROOT and rejected once they pass this size
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get("RECIPE_IMAGE_MAX_UPLOAD_SIZE", 10 * 2 ** 20)
+)
+# read tag and ingredient ids from the arrays the DB keeps on core_recipe,
+# so lists and tag/ingredient filters skip the link tables (GIN indexed)
+RECIPE_RELATION_ARRAYS = os.environ.get("RECIPE_RELATION_ARRAYS") == "1"
+
 # Other settings
 
 AUTH_USER_MODEL = "core.User"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "core": {"handlers": ["console"], "level": "INFO"},
+        "recipe": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
+# Token authentication cache (see core.authentication). Each worker keeps
+# up to MAX_SIZE resolved tokens for TTL seconds. A deleted token or a
+# deactivated user is dropped at once in the worker that made the change,
+# other workers may accept it for up to TTL seconds. SHARED_CACHE names an
+# entry in CACHES shared between workers, e.g. memcached; with it every
+# worker re-checks invalidations at least every VERSION_CHECK seconds.
+TOKEN_AUTH_CACHE = {
+    "MAX_SIZE": int(os.environ.get("TOKEN_AUTH_CACHE_SIZE", 10000)),
+    "TTL": int(os.environ.get("TOKEN_AUTH_CACHE_TTL", 60)),
+    "SHARED_CACHE": os.environ.get("TOKEN_AUTH_SHARED_CACHE"),
+    "VERSION_CHECK": float(os.environ.get("TOKEN_AUTH_VERSION_CHECK", 1)),
+}
+
+# API renderers and parsers (see core.renderers and core.parsers). orjson
+# speeds up JSON when installed; msgpack, when installed, is offered as
+# application/msgpack. The browsable API is only served with DEBUG on.
+MSGPACK_AVAILABLE = find_spec("msgpack") is not None
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        *(["core.renderers.MessagePackRenderer"] if MSGPACK_AVAILABLE else []),
+        *(["rest_framework.renderers.BrowsableAPIRenderer"] if DEBUG else []),
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        *(["core.parsers.MessagePackParser"] if MSGPACK_AVAILABLE else []),
+    ],
+    "EXCEPTION_HANDLER": "core.exceptions.exception_handler",
+}
@@ -0,0 +1,241 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.passwords import hash_password, verify_password
+from core.versions import bump_version, get_version
+
+DEFAULTS = {"MAX_SIZE": 10000, "TTL": 60, "SHARED_CACHE": None, "VERSION_CHECK": 1}
+
+
+class TokenCache:
+    """
+    Bounded LRU of token key -> user with a TTL, optionally in front of a
+    shared Django cache so other workers can skip the database as well.
+
+    Deleting a token or saving a user drops its entries in this process
+    right away. Without a shared cache other workers keep serving theirs
+    until the TTL runs out. With one, entries carry the user's version
+    from the shared cache, which every invalidation bumps, and a local
+    hit re-reads it at most every version_check seconds; that interval
+    bounds how long another worker serves a stale entry. Each hit
+    returns a copy, requests never share a User instance.
+    """
+
+    key_prefix = "authtoken:"
+
+    def __init__(self, max_size, ttl, shared_cache=None, version_check=1):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_cache = shared_cache
+        self.version_check = version_check
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _shared_key(self, key):
+        """never use the raw token as a key outside this process"""
+        return self.key_prefix + hashlib.sha256(key.encode()).hexdigest()
+
+    def _version(self, user_id):
+        """return the shared invalidation version of a user's tokens"""
+        return get_version(self.shared_cache, self.key_prefix, user_id)
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def get(self, key):
+        """return a copy of the cached user for key or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+
+        if entry is not None:
+            expiry, user, version, checked = entry
+            if self.shared_cache is None or now < checked + self.version_check:
+                return self._hit(key, user)
+            if version == self._version(user.pk):
+                with self._lock:
+                    if key in self._entries:
+                        self._entries[key] = (expiry, user, version, now)
+                return self._hit(key, user)
+            with self._lock:
+                self._entries.pop(key, None)
+
+        if self.shared_cache is None:
+            self._miss()
+            return None
+
+        cached = self.shared_cache.get(self._shared_key(key))
+        if cached is None or cached[1] != self._version(cached[0].pk):
+            self._miss()
+            return None
+
+        with self._lock:
+            self.shared_hits += 1
+        user, version = cached
+        self._set_local(key, user, version)
+        return copy.deepcopy(user)
+
+    def _hit(self, key, user):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(user)
+
+    def _set_local(self, key, user, version):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, user, version, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set(self, key, user):
+        """cache a copy of user for key in every tier"""
+        user = copy.deepcopy(user)
+        if self.shared_cache is None:
+            self._set_local(key, user, None)
+            return
+
+        version = self._version(user.pk)
+        self._set_local(key, user, version)
+        self.shared_cache.set(self._shared_key(key), (user, version), self.ttl)
+
+    def delete(self, *keys):
+        """forget keys in every tier"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared_cache is not None:
+            self.shared_cache.delete_many([self._shared_key(key) for key in keys])
+
+    def delete_user(self, user_id, keys=()):
+        """forget every cached token of a user, in every worker"""
+        if self.shared_cache is not None:
+            bump_version(self.shared_cache, self.key_prefix, user_id)
+        with self._lock:
+            local_keys = [
+                key
+                for key, (_, user, _, _) in self._entries.items()
+                if user.pk == user_id
+            ]
+        self.delete(*set(local_keys).union(keys))
+
+    def clear(self):
+        """empty the local tier and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        """return hit/miss counters and the current size"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+            }
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """return the process wide token cache configured in settings"""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                conf = dict(DEFAULTS, **getattr(settings, "TOKEN_AUTH_CACHE", {}))
+                shared = conf["SHARED_CACHE"]
+                _token_cache = TokenCache(
+                    conf["MAX_SIZE"],
+                    conf["TTL"],
+                    caches[shared] if shared else None,
+                    conf["VERSION_CHECK"],
+                )
+
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    """rebuild the token cache when tests override its settings"""
+    global _token_cache
+    if setting in ("TOKEN_AUTH_CACHE", "CACHES"):
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that caches token -> user resolution"""
+
+    def authenticate_credentials(self, key):
+        """resolve key from the cache before falling back to the database"""
+        cache = get_token_cache()
+        user = cache.get(key)
+
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(key, user)
+            return (user, token)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        return (user, self.get_model()(key=key, user=user))
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend hashing on the bounded pool.
+
+    The user is loaded and saved in the calling thread, only hashing runs
+    on the pool. Hashes made with a hasher other than the preferred one,
+    or with older parameters, are replaced on a successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # hash anyway so unknown emails answer as slowly as bad passwords
+            hash_password(password)
+            return None
+
+        valid, rehashed = verify_password(password, user.password)
+        if not valid:
+            return None
+        if rehashed is not None:
+            user.password = rehashed
+            user.save(update_fields=["password"])
+
+        return user if self.user_can_authenticate(user) else None
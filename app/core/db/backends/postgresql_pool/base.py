@@ -0,0 +1,106 @@
+"""
+PostgreSQL backend that checks connections out of a per-process pool
+instead of opening a new one for every request.
+
+Pool settings are read from the "POOL" entry of the database settings:
+MIN_SIZE, MAX_SIZE, MAX_LIFETIME (seconds), TIMEOUT (seconds to wait for a
+free connection), CHECK (run SELECT 1 on checkout) and STATS_INTERVAL
+(seconds between "db pool" log lines, 0 disables them).
+"""
+import os
+import threading
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def check_connection(conn):
+    """health check run on checkout"""
+    if conn.closed:
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    if not conn.autocommit:
+        conn.rollback()
+    return True
+
+
+def reset_connection(conn):
+    """roll back whatever a request left open before reusing conn"""
+    if conn.closed:
+        raise base.Database.InterfaceError("connection already closed")
+    if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """return the pool for alias and conn_params, creating it if needed"""
+    key = (os.getpid(), alias, repr(sorted(conn_params.items())))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                conf = settings_dict.get("POOL", {})
+                pool = ConnectionPool(
+                    lambda: base.Database.connect(**conn_params),
+                    min_size=int(conf.get("MIN_SIZE", 0)),
+                    max_size=int(conf.get("MAX_SIZE", 10)),
+                    max_lifetime=int(conf.get("MAX_LIFETIME", 3600)),
+                    timeout=int(conf.get("TIMEOUT", 30)),
+                    check=check_connection if conf.get("CHECK", True) else None,
+                    reset=reset_connection,
+                    stats_interval=int(conf.get("STATS_INTERVAL", 0)),
+                    name=alias,
+                )
+                _pools[key] = pool
+
+    return pool
+
+
+def close_pools():
+    """close the idle connections of every pool in this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.closeall()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """pooled connections would keep the test database from being dropped"""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """postgresql DatabaseWrapper whose connections come from a pool"""
+
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(self.alias, self.settings_dict, conn_params)
+        connection = self.pool.getconn()
+
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = options["isolation_level"]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """raised when no connection frees up within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    A thread safe pool of DB-API connections.
+
+    connect() opens a new connection, check(conn) returns False for a
+    connection that should not be handed out, reset(conn) cleans up a
+    returned connection and close(conn) disposes of one. Connections older
+    than max_lifetime seconds are closed instead of being reused.
+    """
+
+    def __init__(
+        self,
+        connect,
+        min_size=0,
+        max_size=10,
+        max_lifetime=3600,
+        timeout=30,
+        check=None,
+        reset=None,
+        close=None,
+        stats_interval=0,
+        name="default",
+    ):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check = check
+        self.reset = reset
+        self.close_connection = close or (lambda conn: conn.close())
+        self.stats_interval = stats_interval
+        self.name = name
+
+        self._idle = []
+        self._created = {}
+        self._pending = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._last_log = time.monotonic()
+        self.counters = {"opened": 0, "closed": 0, "checkouts": 0, "timeouts": 0}
+
+    def _open(self):
+        """open a connection for a slot reserved through _pending"""
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._pending -= 1
+            self._created[conn] = time.monotonic()
+            self.counters["opened"] += 1
+
+        return conn
+
+    def _dispose(self, conn):
+        """close conn and free its slot"""
+        with self._cond:
+            self._created.pop(conn, None)
+            self.counters["closed"] += 1
+            self._cond.notify()
+        try:
+            self.close_connection(conn)
+        except Exception:
+            logger.debug("Error closing pooled connection", exc_info=True)
+
+    def _expired(self, conn):
+        if not self.max_lifetime:
+            return False
+        created = self._created.get(conn, 0)
+        return time.monotonic() - created > self.max_lifetime
+
+    def _usable(self, conn):
+        if self.check is None:
+            return True
+        try:
+            return self.check(conn)
+        except Exception:
+            return False
+
+    def _take(self):
+        """pop an idle connection, or reserve a slot and return None"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._created) + self._pending < self.max_size:
+                    self._pending += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No connection available in pool {self.name!r} "
+                        f"after {self.timeout}s"
+                    )
+                self._waiting += 1
+                self._cond.wait(remaining)
+                self._waiting -= 1
+
+    def getconn(self):
+        """check out a healthy connection"""
+        self._warm_up()
+        while True:
+            conn = self._take()
+            if conn is None:
+                conn = self._open()
+                break
+            if not self._expired(conn) and self._usable(conn):
+                break
+            self._dispose(conn)
+
+        with self._cond:
+            self.counters["checkouts"] += 1
+        self._maybe_log()
+        return conn
+
+    def putconn(self, conn):
+        """return a checked out connection to the pool"""
+        if self._expired(conn):
+            self._dispose(conn)
+            return
+
+        if self.reset is not None:
+            try:
+                self.reset(conn)
+            except Exception:
+                self._dispose(conn)
+                return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _warm_up(self):
+        """open idle connections until min_size exist"""
+        while True:
+            with self._cond:
+                if len(self._created) + self._pending >= self.min_size:
+                    return
+                self._pending += 1
+            self.putconn(self._open())
+
+    def closeall(self):
+        """close every idle connection"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._dispose(conn)
+
+    def stats(self):
+        """return the current pool size and counters"""
+        with self._cond:
+            size = len(self._created)
+            return dict(
+                self.counters,
+                size=size,
+                idle=len(self._idle),
+                in_use=size - len(self._idle),
+                waiting=self._waiting,
+                min_size=self.min_size,
+                max_size=self.max_size,
+            )
+
+    def _maybe_log(self):
+        """log a stats line at most every stats_interval seconds"""
+        if not self.stats_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_log < self.stats_interval:
+            return
+        self._last_log = now
+        stats = self.stats()
+        logger.info(
+            "db pool %s: %s",
+            self.name,
+            " ".join(f"{key}={stats[key]}" for key in sorted(stats)),
+        )
@@ -0,0 +1,20 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import Throttled
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from core.passwords import HashingBusy
+
+
+class HashingThrottled(Throttled):
+    """a login or password change found the hashing pool full"""
+
+    default_detail = _("Too many logins in progress, retry shortly.")
+    default_code = "hashing_busy"
+
+
+def exception_handler(exc, context):
+    """DRF's exception handler, answering HashingBusy with a 429"""
+    if isinstance(exc, HashingBusy):
+        exc = HashingThrottled(wait=1)
+
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,68 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hashers, make_password
+from django.core.management.base import BaseCommand
+
+from core.passwords import verify_password
+
+PASSWORD = "correct horse battery staple"
+
+
+class Command(BaseCommand):
+    """Django command to time password checks per hasher and through the pool"""
+
+    help = "Report logins per second per core for each password hasher"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rounds", type=int, default=20, help="password checks per hasher"
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="concurrent logins sent to the hashing pool",
+        )
+
+    def time_hasher(self, hasher, rounds):
+        """return the mean seconds of one password check with hasher"""
+        encoded = make_password(PASSWORD, hasher=hasher.algorithm)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            check_password(PASSWORD, encoded)
+        return (time.perf_counter() - start) / rounds
+
+    def time_pool(self, rounds, clients):
+        """return logins per second checked through the hashing pool"""
+        encoded = make_password(PASSWORD)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(
+                executor.map(
+                    lambda _: verify_password(PASSWORD, encoded), range(rounds)
+                )
+            )
+        return rounds / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        rounds = options["rounds"]
+        for hasher in get_hashers():
+            try:
+                seconds = self.time_hasher(hasher, rounds)
+            except ValueError:
+                self.stdout.write(f"{hasher.algorithm:<16} library not installed")
+                continue
+            self.stdout.write(
+                f"{hasher.algorithm:<16} {seconds * 1000:8.1f} ms per login "
+                f"{1 / seconds:8.1f} logins/s per core"
+            )
+
+        workers = settings.PASSWORD_HASH_WORKERS
+        rate = self.time_pool(rounds, options["clients"])
+        self.stdout.write(
+            f"pool ({workers} workers, {options['clients']} clients) "
+            f"{rate:8.1f} logins/s, {rate / workers:8.1f} per worker"
+        )
@@ -0,0 +1,84 @@
+import io
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser, MessagePackParser
+from core.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+
+
+def recipe_list(count):
+    """return count recipes in the RecipeDetailSerializer shape"""
+    return [
+        {
+            "id": pk,
+            "title": f"Recipe nº {pk}",
+            "ingredients": [
+                {"id": pk * 10 + n, "name": f"ingredient {n}"} for n in range(8)
+            ],
+            "price": str(Decimal(pk % 5000) / 100),
+            "time_minutes": pk % 120,
+            "tags": [{"id": pk * 10 + n, "name": f"tag {n}"} for n in range(3)],
+            "link": f"https://example.com/recipes/{pk}",
+        }
+        for pk in range(1, count + 1)
+    ]
+
+
+class Command(BaseCommand):
+    """Django command to time the API renderers and parsers"""
+
+    help = "Compare stdlib and fast JSON (and msgpack) on a large recipe list"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=5000, help="recipes in the list"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="best of this many runs"
+        )
+
+    def best_of(self, repeat, func):
+        """return the fastest of repeat runs of func, in seconds"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def measure(self, renderer, parser, data, repeat):
+        """return (render seconds, parse seconds, body size) of one pair"""
+        media_type = renderer.media_type
+        body = renderer.render(data, media_type)
+        render = self.best_of(repeat, lambda: renderer.render(data, media_type))
+        parse = self.best_of(
+            repeat, lambda: parser.parse(io.BytesIO(body), media_type, {})
+        )
+        return render, parse, len(body)
+
+    def handle(self, *args, **options):
+        data = recipe_list(options["count"])
+        repeat = options["repeat"]
+        cases = [
+            ("json (stdlib)", JSONRenderer(), JSONParser()),
+            ("json (fast)", FastJSONRenderer(), FastJSONParser()),
+        ]
+        if msgpack is not None:
+            cases.append(("msgpack", MessagePackRenderer(), MessagePackParser()))
+        if orjson is None:
+            self.stdout.write("orjson is not installed, fast JSON uses the stdlib")
+
+        baseline = None
+        for name, renderer, parser in cases:
+            render, parse, size = self.measure(renderer, parser, data, repeat)
+            baseline = baseline or (render, parse)
+            self.stdout.write(
+                f"{name:<14} render {render * 1000:8.1f} ms "
+                f"({baseline[0] / render:4.1f}x)  "
+                f"parse {parse * 1000:8.1f} ms ({baseline[1] / parse:4.1f}x)  "
+                f"{size} bytes"
+            )
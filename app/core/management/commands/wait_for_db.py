@@ -1,20 +1,83 @@
+import random
 import time
 
 from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+
+class NotReady(Exception):
+    """the database answers but is not ready to serve the app yet"""
 
 
 class Command(BaseCommand):
     """Django command to pause exec till db is available"""
 
+    help = "Wait until the database accepts queries, backing off between tries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="give up after this many seconds (default: 60)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="initial wait between attempts in seconds, doubled each retry",
+        )
+        parser.add_argument(
+            "--max-interval",
+            type=float,
+            default=5,
+            help="upper bound for the wait between attempts",
+        )
+        parser.add_argument(
+            "--check-migrations",
+            action="store_true",
+            help="also wait until every migration is applied",
+        )
+        parser.add_argument("--database", default="default")
+
+    def check_db(self, alias):
+        """open a real connection and run a trivial query"""
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+
+    def pending_migrations(self, alias):
+        """return the migrations that still have to be applied"""
+        executor = MigrationExecutor(connections[alias])
+        return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
     def handle(self, *args, **options):
+        alias = options["database"]
+        deadline = time.monotonic() + options["timeout"]
+        interval = options["interval"]
+
         self.stdout.write("Waiting for DB...")
-        db_conn = None
-        while not db_conn:
+        while True:
             try:
-                db_conn = connections["default"]
-            except OperationalError:
-                self.stdout.write("DB unavailable, waiting 1 second...")
-                time.sleep(1)
+                self.check_db(alias)
+                if options["check_migrations"] and self.pending_migrations(alias):
+                    raise NotReady("migrations pending")
+                break
+            except (OperationalError, NotReady) as exc:
+                # drop a half open connection so the next try reconnects
+                if not connections[alias].in_atomic_block:
+                    connections[alias].close()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f"DB not ready after {options['timeout']} seconds: {exc}"
+                    )
+                # jitter keeps many containers from retrying in lockstep
+                delay = min(random.uniform(interval / 2, interval), remaining)
+                self.stdout.write(f"DB unavailable, waiting {delay:.1f} seconds...")
+                time.sleep(delay)
+                interval = min(interval * 2, options["max_interval"])
+
         self.stdout.write(self.style.SUCCESS("DB Connected."))
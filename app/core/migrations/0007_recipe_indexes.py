@@ -0,0 +1,41 @@
+# Generated by Django 2.2.7 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_recipe_image"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(
+                fields=["user", "name", "id"], name="core_ingredient_user_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["user", "id"], name="core_recipe_user_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["user", "name", "id"], name="core_tag_user_name_idx"
+            ),
+        ),
+        # the implicit M2M tables only have a (recipe_id, x_id) unique index,
+        # so filtering recipes by tag or ingredient id needs the reverse one
+        migrations.RunSQL(
+            "CREATE INDEX core_recipe_tags_tag_recipe_idx "
+            "ON core_recipe_tags (tag_id, recipe_id)",
+            "DROP INDEX core_recipe_tags_tag_recipe_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx "
+            "ON core_recipe_ingredients (ingredient_id, recipe_id)",
+            "DROP INDEX core_recipe_ingredients_ingredient_recipe_idx",
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.7 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_recipe_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_thumbnail",
+            field=models.ImageField(null=True, upload_to="uploads/recipe/"),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="image_webp",
+            field=models.ImageField(null=True, upload_to="uploads/recipe/"),
+        ),
+    ]
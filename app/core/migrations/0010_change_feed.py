@@ -0,0 +1,73 @@
+# Generated by Django 2.2.7 on 2026-10-18 13:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_changes(apps, schema_editor):
+    """record every existing row so a first sync returns all of them"""
+    Change = apps.get_model("core", "Change")
+    for kind in ("tag", "ingredient", "recipe"):
+        model = apps.get_model("core", kind.capitalize())
+        rows = model.objects.order_by("pk").values_list("pk", "user_id")
+        Change.objects.bulk_create(
+            (
+                Change(user_id=user_id, kind=kind, object_id=pk, action="upsert")
+                for pk, user_id in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("tag", "tag"),
+                            ("ingredient", "ingredient"),
+                            ("recipe", "recipe"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("object_id", models.IntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[("upsert", "upsert"), ("delete", "delete")],
+                        max_length=8,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="change",
+            index=models.Index(fields=["user", "id"], name="core_change_user_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="change",
+            index=models.Index(
+                fields=["kind", "object_id"], name="core_change_object_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
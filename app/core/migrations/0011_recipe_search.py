@@ -0,0 +1,157 @@
+# Generated by Django 2.2.7 on 2026-10-18 13:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_DOCUMENT = """
+CREATE FUNCTION core_recipe_search_document(recipe integer, title text)
+RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(t.name, ' ') FROM core_tag t
+            JOIN core_recipe_tags rt ON rt.tag_id = t.id
+            WHERE rt.recipe_id = recipe
+        ), '')), 'B')
+        || setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(i.name, ' ') FROM core_ingredient i
+            JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+            WHERE ri.recipe_id = recipe
+        ), '')), 'C')
+$$;
+
+CREATE FUNCTION core_recipe_search_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := core_recipe_search_document(NEW.id, NEW.title);
+    RETURN NEW;
+END $$;
+
+-- writing search_vector (even NULL) recomputes it, which is how the
+-- triggers below ask for a refresh
+CREATE TRIGGER core_recipe_search_update
+BEFORE INSERT OR UPDATE OF title, search_vector ON core_recipe
+FOR EACH ROW EXECUTE PROCEDURE core_recipe_search_update();
+"""
+
+LINK_TRIGGERS = """
+CREATE FUNCTION core_recipe_search_links() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_recipe SET search_vector = NULL
+    WHERE id IN (SELECT recipe_id FROM changed_rows);
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER core_recipe_tags_search_insert
+AFTER INSERT ON core_recipe_tags REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+CREATE TRIGGER core_recipe_tags_search_delete
+AFTER DELETE ON core_recipe_tags REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+CREATE TRIGGER core_recipe_ingredients_search_insert
+AFTER INSERT ON core_recipe_ingredients REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+CREATE TRIGGER core_recipe_ingredients_search_delete
+AFTER DELETE ON core_recipe_ingredients REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+"""
+
+RENAME_TRIGGERS = """
+CREATE FUNCTION core_tag_search_rename() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_recipe SET search_vector = NULL WHERE id IN (
+        SELECT rt.recipe_id FROM core_recipe_tags rt
+        JOIN new_rows n ON n.id = rt.tag_id
+        JOIN old_rows o ON o.id = n.id
+        WHERE n.name IS DISTINCT FROM o.name
+    );
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION core_ingredient_search_rename() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_recipe SET search_vector = NULL WHERE id IN (
+        SELECT ri.recipe_id FROM core_recipe_ingredients ri
+        JOIN new_rows n ON n.id = ri.ingredient_id
+        JOIN old_rows o ON o.id = n.id
+        WHERE n.name IS DISTINCT FROM o.name
+    );
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER core_tag_search_rename
+AFTER UPDATE ON core_tag REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_tag_search_rename();
+CREATE TRIGGER core_ingredient_search_rename
+AFTER UPDATE ON core_ingredient
+REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_ingredient_search_rename();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER core_ingredient_search_rename ON core_ingredient;
+DROP TRIGGER core_tag_search_rename ON core_tag;
+DROP FUNCTION core_ingredient_search_rename();
+DROP FUNCTION core_tag_search_rename();
+DROP TRIGGER core_recipe_ingredients_search_delete ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_ingredients_search_insert ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_tags_search_delete ON core_recipe_tags;
+DROP TRIGGER core_recipe_tags_search_insert ON core_recipe_tags;
+DROP FUNCTION core_recipe_search_links();
+DROP TRIGGER core_recipe_search_update ON core_recipe;
+DROP FUNCTION core_recipe_search_update();
+DROP FUNCTION core_recipe_search_document(integer, text);
+"""
+
+
+def create_trigram_index(apps, schema_editor):
+    """add a trigram index on titles where pg_trgm can be installed"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS core_recipe_title_trgm_idx "
+        "ON core_recipe USING gin (title gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS core_recipe_title_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_change_feed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="core_recipe_search_idx"
+            ),
+        ),
+        migrations.RunSQL(
+            SEARCH_DOCUMENT + LINK_TRIGGERS + RENAME_TRIGGERS, DROP_TRIGGERS
+        ),
+        # fill the column for existing recipes
+        migrations.RunSQL(
+            "UPDATE core_recipe SET search_vector = NULL", migrations.RunSQL.noop
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 2.2.7 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+COUNTERS = """
+CREATE FUNCTION core_{model}_usage() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_{model} o
+    SET usage_count = o.usage_count + TG_ARGV[0]::integer * c.n, updated_at = now()
+    FROM (
+        SELECT {model}_id, count(*) AS n FROM changed_rows GROUP BY {model}_id
+    ) c
+    WHERE o.id = c.{model}_id;
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER core_recipe_{table}_usage_insert
+AFTER INSERT ON core_recipe_{table} REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_{model}_usage(1);
+CREATE TRIGGER core_recipe_{table}_usage_delete
+AFTER DELETE ON core_recipe_{table} REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_{model}_usage('-1');
+
+UPDATE core_{model} o SET usage_count = (
+    SELECT count(*) FROM core_recipe_{table} l WHERE l.{model}_id = o.id
+);
+
+-- only the counter trigger may write usage_count, a model save() writes
+-- back the value it loaded and would undo concurrent counts
+CREATE FUNCTION core_{model}_keep_usage() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF pg_trigger_depth() = 1 THEN
+        NEW.usage_count := OLD.usage_count;
+    END IF;
+    RETURN NEW;
+END $$;
+
+CREATE TRIGGER core_{model}_keep_usage
+BEFORE UPDATE OF usage_count ON core_{model}
+FOR EACH ROW EXECUTE PROCEDURE core_{model}_keep_usage();
+"""
+
+DROP_COUNTERS = """
+DROP TRIGGER core_{model}_keep_usage ON core_{model};
+DROP FUNCTION core_{model}_keep_usage();
+DROP TRIGGER core_recipe_{table}_usage_delete ON core_recipe_{table};
+DROP TRIGGER core_recipe_{table}_usage_insert ON core_recipe_{table};
+DROP FUNCTION core_{model}_usage();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_recipe_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="usage_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="usage_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            COUNTERS.format(model="tag", table="tags"),
+            DROP_COUNTERS.format(model="tag", table="tags"),
+        ),
+        migrations.RunSQL(
+            COUNTERS.format(model="ingredient", table="ingredients"),
+            DROP_COUNTERS.format(model="ingredient", table="ingredients"),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 2.2.7 on 2026-10-18 13:59
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+RECIPE_ARRAYS = """
+CREATE FUNCTION core_recipe_relation_arrays() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.tag_ids := coalesce((
+        SELECT array_agg(tag_id ORDER BY tag_id) FROM core_recipe_tags
+        WHERE recipe_id = NEW.id
+    ), '{}');
+    NEW.ingredient_ids := coalesce((
+        SELECT array_agg(ingredient_id ORDER BY ingredient_id)
+        FROM core_recipe_ingredients WHERE recipe_id = NEW.id
+    ), '{}');
+    RETURN NEW;
+END $$;
+
+-- writing either array (even NULL) recomputes both from the link tables,
+-- so a model save() cannot write back stale ids
+CREATE TRIGGER core_recipe_relation_arrays
+BEFORE INSERT OR UPDATE OF tag_ids, ingredient_ids ON core_recipe
+FOR EACH ROW EXECUTE PROCEDURE core_recipe_relation_arrays();
+
+UPDATE core_recipe SET tag_ids = NULL;
+"""
+
+DROP_RECIPE_ARRAYS = """
+DROP TRIGGER core_recipe_relation_arrays ON core_recipe;
+DROP FUNCTION core_recipe_relation_arrays();
+"""
+
+LINK_TRIGGERS = """
+CREATE FUNCTION core_recipe_{table}_ids() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_recipe SET {model}_ids = NULL
+    WHERE id IN (SELECT recipe_id FROM changed_rows);
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER core_recipe_{table}_ids_insert
+AFTER INSERT ON core_recipe_{table} REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_{table}_ids();
+CREATE TRIGGER core_recipe_{table}_ids_delete
+AFTER DELETE ON core_recipe_{table} REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_{table}_ids();
+"""
+
+DROP_LINK_TRIGGERS = """
+DROP TRIGGER core_recipe_{table}_ids_delete ON core_recipe_{table};
+DROP TRIGGER core_recipe_{table}_ids_insert ON core_recipe_{table};
+DROP FUNCTION core_recipe_{table}_ids();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_usage_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="ingredient_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(),
+                default=list,
+                editable=False,
+                size=None,
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="tag_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(),
+                default=list,
+                editable=False,
+                size=None,
+            ),
+        ),
+        migrations.RunSQL(RECIPE_ARRAYS, DROP_RECIPE_ARRAYS),
+        migrations.RunSQL(
+            LINK_TRIGGERS.format(model="tag", table="tags"),
+            DROP_LINK_TRIGGERS.format(table="tags"),
+        ),
+        migrations.RunSQL(
+            LINK_TRIGGERS.format(model="ingredient", table="ingredients"),
+            DROP_LINK_TRIGGERS.format(table="ingredients"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["tag_ids"], name="core_recipe_tag_ids_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["ingredient_ids"], name="core_recipe_ingredient_ids_idx"
+            ),
+        ),
+    ]
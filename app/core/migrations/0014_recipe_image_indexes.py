@@ -0,0 +1,27 @@
+# Generated by Django 2.2.7 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_relation_arrays"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["image"], name="core_recipe_image_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["image_thumbnail"], name="core_recipe_thumbnail_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["image_webp"], name="core_recipe_webp_idx"),
+        ),
+    ]
@@ -2,6 +2,9 @@ import uuid
 import os
 
 from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -9,6 +12,8 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 
+from core.passwords import hash_password
+
 
 def recipe_image_file_path(instance, filename):
     """generate filepath for recipe image"""
@@ -18,6 +23,11 @@ def recipe_image_file_path(instance, filename):
     return os.path.join("uploads/recipe/", filename)
 
 
+def recipe_image_digest_path(digest, extension):
+    """generate content addressed filepath for recipe image"""
+    return os.path.join("uploads/recipe/", digest[:2], f"{digest}.{extension}")
+
+
 class UserManager(BaseUserManager):
     """Custom user manager"""
 
@@ -56,12 +66,25 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = "email"
 
+    def set_password(self, raw_password):
+        """hash the password on the bounded pool of core.passwords"""
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
 
 class Tag(models.Model):
     """A tag for a recipe"""
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,)
+    updated_at = models.DateTimeField(auto_now=True)
+    # number of recipes using it; kept current by DB triggers
+    usage_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "name", "id"], name="core_tag_user_name_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -72,6 +95,16 @@ class Ingredient(models.Model):
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,)
+    updated_at = models.DateTimeField(auto_now=True)
+    # number of recipes using it; kept current by DB triggers
+    usage_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "name", "id"], name="core_ingredient_user_name_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -88,6 +121,52 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField(Ingredient)
     tags = models.ManyToManyField(Tag)
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # resized variants of image, generated in the background by recipe.images
+    image_thumbnail = models.ImageField(null=True, upload_to="uploads/recipe/")
+    image_webp = models.ImageField(null=True, upload_to="uploads/recipe/")
+    updated_at = models.DateTimeField(auto_now=True)
+    # title, tag and ingredient names; kept current by DB triggers
+    search_vector = SearchVectorField(null=True, editable=False)
+    # sorted tag and ingredient ids; kept current by DB triggers
+    tag_ids = ArrayField(models.IntegerField(), default=list, editable=False)
+    ingredient_ids = ArrayField(models.IntegerField(), default=list, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="core_recipe_user_id_idx"),
+            GinIndex(fields=["search_vector"], name="core_recipe_search_idx"),
+            GinIndex(fields=["tag_ids"], name="core_recipe_tag_ids_idx"),
+            GinIndex(fields=["ingredient_ids"], name="core_recipe_ingredient_ids_idx"),
+            # stored file reference checks, see recipe.storage
+            models.Index(fields=["image"], name="core_recipe_image_idx"),
+            models.Index(fields=["image_thumbnail"], name="core_recipe_thumbnail_idx"),
+            models.Index(fields=["image_webp"], name="core_recipe_webp_idx"),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class Change(models.Model):
+    """Latest change of a tag, ingredient or recipe, for delta sync"""
+
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTIONS = ((UPSERT, "upsert"), (DELETE, "delete"))
+    KINDS = (("tag", "tag"), ("ingredient", "ingredient"), ("recipe", "recipe"))
+
+    # the id doubles as the sync sequence number
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,)
+    kind = models.CharField(max_length=16, choices=KINDS)
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=8, choices=ACTIONS)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="core_change_user_id_idx"),
+            models.Index(fields=["kind", "object_id"], name="core_change_object_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.kind} {self.object_id}"
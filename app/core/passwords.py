@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+class HashingBusy(Exception):
+    """every password hashing slot of this process is taken"""
+
+
+def get_executor():
+    """return the process wide hashing pool and the semaphore bounding it"""
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(
+                    settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE
+                )
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix="password-hash",
+                )
+
+    return _executor, _slots
+
+
+def run_hashing(func, *args):
+    """
+    run a hashing call on the pool and return its result
+
+    At most PASSWORD_HASH_WORKERS hashes run at once, so a login storm
+    cannot take every core from other requests. Callers beyond the queue
+    wait up to PASSWORD_HASH_WAIT seconds, then get HashingBusy, which
+    the API answers with a 429 (see core.exceptions).
+    """
+    executor, slots = get_executor()
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+        raise HashingBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def _verify(password, encoded):
+    """return whether password matches and its new hash if encoded is outdated"""
+    rehashed = []
+    valid = check_password(
+        password, encoded, setter=lambda raw: rehashed.append(make_password(raw))
+    )
+    return valid, rehashed[0] if rehashed else None
+
+
+def hash_password(password):
+    """return make_password(password) computed on the hashing pool"""
+    return run_hashing(make_password, password)
+
+
+def verify_password(password, encoded):
+    """return (valid, rehashed or None) computed on the hashing pool"""
+    return run_hashing(_verify, password, encoded)
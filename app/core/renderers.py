@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, msgpack is not offered without it
+    msgpack = None
+
+# escaped by JSONRenderer as well, they end JavaScript string literals
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+# values that are not containers and never hold a float
+PLAIN_TYPES = frozenset((str, int, bool, type(None)))
+
+
+def default(obj):
+    """encode what orjson or msgpack do not, the way DRF's encoder does"""
+    return encoders.JSONEncoder().default(obj)
+
+
+def has_special_float(value):
+    """
+    check if value holds a float that orjson formats unlike the stdlib
+
+    That is NaN and infinity, which the stdlib refuses, and floats written
+    with an exponent, 1e16 is 1e+16 and 1e-7 is 1e-07 in the stdlib.
+    """
+    if isinstance(value, (float, Decimal)):
+        value = float(value)
+        return not (value == 0 or 1e-4 <= abs(value) < 1e16)
+
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return False
+
+    for item in value:
+        if type(item) not in PLAIN_TYPES and has_special_float(item):
+            return True
+
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer using orjson when it is installed.
+
+    Output matches JSONRenderer's compact form: Decimal, datetime and the
+    other types orjson would format differently go through DRF's encoder.
+    Data holding NaN, infinity or floats written with an exponent is
+    rendered by the stdlib, which raises on the former and formats the
+    latter its own way. Indented output, as the browsable API asks for,
+    uses the stdlib as well.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            or has_special_float(data)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers past 64 bits or non-string keys
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer for application/msgpack, needs the msgpack package"""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        return msgpack.packb(data, default=default, use_bin_type=True)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import get_token_cache
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """drop a deleted token from the token cache of every worker"""
+    get_token_cache().delete_user(instance.user_id, [instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_saved_user_tokens(sender, instance, created, **kwargs):
+    """drop cached tokens of a user that changed, e.g. was deactivated"""
+    if created:
+        return
+
+    keys = Token.objects.filter(user_id=instance.pk).values_list("key", flat=True)
+    get_token_cache().delete_user(instance.pk, keys)
@@ -0,0 +1,26 @@
+import time
+
+
+def _version_key(prefix, owner_id):
+    return f"{prefix}version:{owner_id}"
+
+
+def get_version(cache, prefix, owner_id):
+    """return the current invalidation version of owner_id in cache"""
+    key = _version_key(prefix, owner_id)
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so an evicted counter never reuses old values
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(cache, prefix, owner_id):
+    """move the invalidation version of owner_id in cache forward"""
+    try:
+        cache.incr(_version_key(prefix, owner_id))
+    except ValueError:
+        # evicted, a fresh clock seeded value is newer than any old one
+        get_version(cache, prefix, owner_id)
@@ -0,0 +1,126 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+# uploads named by their sha256 (see recipe.uploads) never change content
+CONTENT_ADDRESSED = re.compile(r"(?:^|/)([0-9a-f]{64}(?:_thumb)?\.\w+)$")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+BLOCK_SIZE = 64 * 2 ** 10
+
+
+def _parse_range(header, size):
+    """return (start, end) of a single byte range, None to send the whole
+    file, or False when the range cannot be satisfied"""
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+
+    if start > end or start >= size:
+        return False
+
+    return start, end
+
+
+def _read_range(path, start, length):
+    """yield length bytes of a file from start"""
+    with open(path, "rb") as fileobj:
+        fileobj.seek(start)
+        while length > 0:
+            chunk = fileobj.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _file_response(request, path, size, etag):
+    """serve a file from the application, honouring Range requests"""
+    header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    byte_range = None
+    if header and (not if_range or if_range == etag):
+        byte_range = _parse_range(header, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, "rb"))
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        _read_range(path, start, end - start + 1), status=206
+    )
+    response["Content-Length"] = str(end - start + 1)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded file with cache validators.
+
+    The transfer is handed to the front proxy with X-Accel-Redirect when
+    MEDIA_ACCEL_REDIRECT_PREFIX is set or X-Sendfile when MEDIA_SENDFILE is
+    on, so that no application worker streams the bytes.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid path")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    stat = os.stat(full_path)
+    content_addressed = CONTENT_ADDRESSED.search(path)
+    if content_addressed:
+        etag = quote_etag(content_addressed.group(1))
+        cache_control = IMMUTABLE
+    else:
+        etag = quote_etag(f"{int(stat.st_mtime):x}-{stat.st_size:x}")
+        cache_control = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+            response = HttpResponse()
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + path
+        elif settings.MEDIA_SENDFILE:
+            response = HttpResponse()
+            response["X-Sendfile"] = os.path.abspath(full_path)
+        else:
+            response = _file_response(request, full_path, stat.st_size, etag)
+            response["Accept-Ranges"] = "bytes"
+
+        if response.status_code != 416:
+            content_type, encoding = mimetypes.guess_type(full_path)
+            response["Content-Type"] = content_type or "application/octet-stream"
+            if encoding:
+                response["Content-Encoding"] = encoding
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from core.models import Change, Tag, Ingredient, Recipe
+from recipe.cache import bump_user_version_on_commit
+from recipe.signals import muted
+from recipe.sync import record_changes
+
+BATCH_SIZE = 500
+RELATIONS = (("tags", Tag), ("ingredients", Ingredient))
+
+
+def check_related(user, items):
+    """check the tag and ingredient ids of every item, one query each"""
+    errors = [{} for _ in items]
+    for field, model in RELATIONS:
+        wanted = {pk for item in items for pk in item.get(field, ())}
+        found = set()
+        if wanted:
+            found = set(
+                model.objects.filter(user=user, pk__in=wanted).values_list(
+                    "pk", flat=True
+                )
+            )
+
+        for item, error in zip(items, errors):
+            missing = [pk for pk in item.get(field, ()) if pk not in found]
+            if missing:
+                error[field] = [
+                    f'Invalid pk "{pk}" - object does not exist.' for pk in missing
+                ]
+
+    if any(errors):
+        raise ValidationError(errors)
+
+
+def write_relations(recipe_ids, items, replace=False):
+    """insert the through rows of every item in one batch per relation"""
+    for field, _ in RELATIONS:
+        through = Recipe._meta.get_field(field).remote_field.through
+        column = Recipe._meta.get_field(field).m2m_reverse_name()
+        targets = [
+            (recipe_id, item[field])
+            for recipe_id, item in zip(recipe_ids, items)
+            if field in item
+        ]
+        if not targets:
+            continue
+
+        if replace:
+            through.objects.filter(
+                recipe_id__in=[recipe_id for recipe_id, _ in targets]
+            ).delete()
+        through.objects.bulk_create(
+            (
+                through(recipe_id=recipe_id, **{column: pk})
+                for recipe_id, pks in targets
+                for pk in dict.fromkeys(pks)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def finish(user, recipe_ids, action=Change.UPSERT):
+    """do once for the batch what the model signals do for a single row"""
+    record_changes(user.pk, "recipe", recipe_ids, action)
+    bump_user_version_on_commit(user.pk)
+
+
+def check_unique_ids(ids):
+    """reject a batch naming the same recipe twice"""
+    seen = set()
+    duplicates = sorted({pk for pk in ids if pk in seen or seen.add(pk)})
+    if duplicates:
+        raise ValidationError({"id": [f"Duplicate ids: {duplicates}"]})
+
+
+@transaction.atomic
+def create_recipes(user, items):
+    """create recipes from validated items, return their ids"""
+    check_related(user, items)
+    recipes = Recipe.objects.bulk_create(
+        (
+            Recipe(
+                user=user,
+                **{k: v for k, v in item.items() if k not in ("tags", "ingredients")},
+            )
+            for item in items
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = [recipe.pk for recipe in recipes]
+    write_relations(recipe_ids, items)
+    finish(user, recipe_ids)
+
+    return recipe_ids
+
+
+@transaction.atomic
+def update_recipes(user, items):
+    """apply validated partial updates, return the recipe ids"""
+    recipe_ids = [item["id"] for item in items]
+    check_unique_ids(recipe_ids)
+    check_related(user, items)
+
+    recipes = Recipe.objects.select_for_update().filter(user=user).in_bulk(recipe_ids)
+    missing = [pk for pk in recipe_ids if pk not in recipes]
+    if missing:
+        raise ValidationError({"id": [f"Recipes not found: {missing}"]})
+
+    now = timezone.now()
+    fields = set()
+    for item in items:
+        recipe = recipes[item["id"]]
+        for name, value in item.items():
+            if name not in ("id", "tags", "ingredients"):
+                setattr(recipe, name, value)
+                fields.add(name)
+        # bulk_update skips auto_now
+        recipe.updated_at = now
+
+    Recipe.objects.bulk_update(
+        recipes.values(), [*sorted(fields), "updated_at"], batch_size=BATCH_SIZE
+    )
+    write_relations(recipe_ids, items, replace=True)
+    finish(user, recipe_ids)
+
+    return recipe_ids
+
+
+@transaction.atomic
+def delete_recipes(user, recipe_ids):
+    """delete recipes of user by id"""
+    check_unique_ids(recipe_ids)
+    queryset = Recipe.objects.filter(user=user, pk__in=recipe_ids)
+    found = set(queryset.values_list("pk", flat=True))
+    missing = [pk for pk in recipe_ids if pk not in found]
+    if missing:
+        raise ValidationError({"ids": [f"Recipes not found: {missing}"]})
+
+    with muted():
+        queryset.delete()
+    finish(user, recipe_ids, Change.DELETE)
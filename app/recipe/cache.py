@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+from core.versions import bump_version, get_version
+
+# query params holding id lists, compared as sets
+ID_LIST_PARAMS = ("tags", "ingredients")
+FLAG_PARAMS = ("assigned_only", "usage_count")
+
+
+def get_cache():
+    """return the cache backend holding per-user responses"""
+    return caches[settings.RECIPE_LIST_CACHE]
+
+
+VERSION_PREFIX = "recipe:"
+
+
+def get_user_version(user_id):
+    """return the current cache version of a user's data"""
+    return get_version(get_cache(), VERSION_PREFIX, user_id)
+
+
+def bump_user_version(user_id):
+    """invalidate every cached response of a user"""
+    bump_version(get_cache(), VERSION_PREFIX, user_id)
+
+
+def bump_user_version_on_commit(user_id):
+    """
+    invalidate a user's cached responses once the current transaction
+    commits, so no reader caches pre-commit data under the new version
+    """
+    transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+def normalize_params(query_params):
+    """return query params as a canonical string"""
+    params = []
+    for name in sorted(query_params):
+        value = query_params.get(name)
+        if name in ID_LIST_PARAMS:
+            try:
+                value = ",".join(
+                    str(i) for i in sorted({int(v) for v in value.split(",")})
+                )
+            except ValueError:
+                pass
+        elif name in FLAG_PARAMS:
+            if not value:
+                continue
+            value = "1"
+        params.append((name, value))
+
+    return urlencode(params)
+
+
+def response_cache_key(request, endpoint):
+    """return the cache key of a response for the requesting user"""
+    user_id = request.user.pk
+    version = get_user_version(user_id)
+    params = normalize_params(request.query_params)
+    return f"recipe:response:{user_id}:{version}:{endpoint}:{params}"
@@ -0,0 +1,56 @@
+from django.db import connection
+
+from core.models import Recipe
+from recipe.query import link_ids_sql, relation_array
+
+CHUNK_SIZE = 2000
+
+
+def _ids_array(relation):
+    """return SQL for the sorted related ids of recipe r as an int array"""
+    field = Recipe._meta.get_field(relation)
+    array = relation_array(field)
+    if array is not None:
+        return f"r.{array}"
+
+    return link_ids_sql(field)
+
+
+def recipe_list_sql(queryset):
+    """
+    return SQL and params selecting the recipes of queryset as JSON text
+
+    Each row is one recipe in the RecipeSerializer shape, newest first.
+    """
+    ids, params = queryset.order_by().values("pk").query.sql_with_params()
+    sql = f"""
+        SELECT json_build_object(
+            'id', r.id,
+            'title', r.title,
+            'ingredients', {_ids_array("ingredients")},
+            'price', r.price::text,
+            'time_minutes', r.time_minutes,
+            'tags', {_ids_array("tags")},
+            'link', r.link
+        )::text
+        FROM {Recipe._meta.db_table} r
+        WHERE r.id IN ({ids})
+        ORDER BY r.id DESC
+    """
+    return sql, params
+
+
+def stream_recipe_list(queryset):
+    """yield a JSON array of recipes built by the database, in chunks"""
+    sql, params = recipe_list_sql(queryset)
+    yield "["
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        separator = ""
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            yield separator + ",".join(row[0] for row in rows)
+            separator = ","
+    yield "]"
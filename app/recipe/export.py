@@ -0,0 +1,89 @@
+import csv
+import json
+from itertools import islice
+
+from core.models import Recipe
+
+CHUNK_SIZE = 2000
+CSV_COLUMNS = ("id", "title", "price", "time_minutes", "link", "tags", "ingredients")
+RELATIONS = ("tags", "ingredients")
+
+
+def _chunks(iterable, size):
+    """yield lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _related(relation, recipe_ids):
+    """return {recipe id: [{id, name}]} of one relation for a chunk"""
+    field = Recipe._meta.get_field(relation)
+    column = field.m2m_reverse_field_name()
+    rows = (
+        field.remote_field.through.objects.filter(recipe_id__in=recipe_ids)
+        .order_by(f"{column}__name", column)
+        .values_list("recipe_id", column, f"{column}__name")
+    )
+    related = {}
+    for recipe_id, pk, name in rows:
+        related.setdefault(recipe_id, []).append({"id": pk, "name": name})
+
+    return related
+
+
+def export_recipes(user, chunk_size=None):
+    """
+    Yield every recipe of user as a dict shaped like the detail endpoint.
+
+    Recipes come from a server side cursor; tags and ingredients are
+    fetched per chunk, so memory use does not grow with the recipe book.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    rows = (
+        Recipe.objects.filter(user=user)
+        .order_by("id")
+        .values("id", "title", "price", "time_minutes", "link")
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in _chunks(rows, chunk_size):
+        recipe_ids = [row["id"] for row in chunk]
+        related = {relation: _related(relation, recipe_ids) for relation in RELATIONS}
+        for row in chunk:
+            row["price"] = str(row["price"])
+            for relation in RELATIONS:
+                row[relation] = related[relation].get(row["id"], [])
+            yield row
+
+
+def ndjson_lines(recipes):
+    """yield one JSON document per line"""
+    for recipe in recipes:
+        yield json.dumps(recipe, separators=(",", ":")) + "\n"
+
+
+class _Echo:
+    """file-like object handing back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(recipes):
+    """yield CSV rows, tags and ingredients as ;-separated names"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for recipe in recipes:
+        for relation in RELATIONS:
+            recipe[relation] = ";".join(item["name"] for item in recipe[relation])
+        yield writer.writerow([recipe[column] for column in CSV_COLUMNS])
+
+
+# output param -> (line generator, content type, file extension)
+FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson", "ndjson"),
+    "csv": (csv_lines, "text/csv", "csv"),
+}
@@ -0,0 +1,153 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from recipe.query import relation_array
+
+# fields whose to_representation returns DB values unchanged
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField)
+# fields whose to_representation only needs the DB value
+CONVERTED_FIELDS = (
+    serializers.BooleanField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+)
+
+
+class Unsupported(Exception):
+    """a serializer field the fast path cannot reproduce"""
+
+
+class FastSerializer:
+    """
+    Read-only stand-in for a ModelSerializer over values() rows.
+
+    Scalar columns are copied straight from the row, to-many relations are
+    fetched for the whole page with one through table query each, and the
+    output dicts are assembled without per instance field objects. The
+    result renders to the same JSON as serializer_class(many=True).data.
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        # (output name, column or None, converting field, m2m field, child)
+        self.fields = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = self.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise Unsupported(f"{serializer_class.__name__}.{name}")
+
+            if model_field.many_to_many:
+                child = self._child(field)
+                self.fields.append((name, None, None, model_field, child))
+            elif isinstance(field, PLAIN_FIELDS + CONVERTED_FIELDS):
+                convert = None if isinstance(field, PLAIN_FIELDS) else field
+                self.fields.append((name, model_field.attname, convert, None, None))
+            else:
+                raise Unsupported(f"{serializer_class.__name__}.{name}")
+
+    def _child(self, field):
+        """return None for a list of ids or the FastSerializer of nested rows"""
+        if isinstance(field, serializers.ManyRelatedField) and isinstance(
+            field.child_relation, serializers.PrimaryKeyRelatedField
+        ):
+            return None
+        if isinstance(field, serializers.ListSerializer) and isinstance(
+            field.child, serializers.ModelSerializer
+        ):
+            child = FastSerializer(type(field.child))
+            if any(relation for _, _, _, relation, _ in child.fields):
+                raise Unsupported(field.field_name)
+            return child
+
+        raise Unsupported(field.field_name)
+
+    @property
+    def arrays(self):
+        """return {output name: id array column} of relations read inline"""
+        arrays = {}
+        for name, _, _, relation, child in self.fields:
+            if relation is not None and child is None:
+                column = relation_array(relation)
+                if column is not None:
+                    arrays[name] = column
+        return arrays
+
+    @property
+    def sources(self):
+        """return the columns to select for a page"""
+        names = [column for _, column, _, _, _ in self.fields if column]
+        names.extend(self.arrays.values())
+        return names if self.pk in names else [self.pk, *names]
+
+    def values(self, queryset):
+        """return queryset as dict rows carrying every column needed"""
+        sources = self.sources
+        extra = [name for name in queryset.query.annotations if name not in sources]
+        return queryset.prefetch_related(None).values(*sources, *extra)
+
+    def _related(self, field, child, pks):
+        """return {pk: [related id or dict]} of one to-many relation"""
+        through = field.remote_field.through
+        own = f"{field.m2m_field_name()}_id"
+        other = field.m2m_reverse_field_name()
+        links = through.objects.filter(**{f"{own}__in": pks}).order_by(f"{other}_id")
+
+        related = {pk: [] for pk in pks}
+        if child is None:
+            for pk, related_pk in links.values_list(own, f"{other}_id"):
+                related[pk].append(related_pk)
+            return related
+
+        columns = [f"{other}__{source}" for source in child.sources]
+        for row in links.values_list(own, *columns):
+            related[row[0]].append(child.build(dict(zip(child.sources, row[1:]))))
+        return related
+
+    def build(self, row, related=None):
+        """return the output dict of one row"""
+        item = {}
+        for name, column, convert, relation, _ in self.fields:
+            if relation is not None:
+                item[name] = related[name][row[self.pk]]
+                continue
+            value = row[column]
+            if convert is not None and value is not None:
+                value = convert.to_representation(value)
+            item[name] = value
+
+        return item
+
+    def to_representation(self, rows):
+        """return output dicts for values() rows"""
+        rows = list(rows)
+        pks = [row[self.pk] for row in rows]
+        arrays = self.arrays
+        related = {
+            name: (
+                {row[self.pk]: row[arrays[name]] for row in rows}
+                if name in arrays
+                else self._related(relation, child, pks)
+            )
+            for name, _, _, relation, child in self.fields
+            if relation is not None
+        }
+
+        return [self.build(row, related) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def fast_serializer(serializer_class):
+    """return the FastSerializer for serializer_class or None if unsupported"""
+    try:
+        return FastSerializer(serializer_class)
+    except Unsupported:
+        return None
@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+WEBP_MAX_SIZE = (1280, 1280)
+WEBP_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """return the process wide image worker pool"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RECIPE_IMAGE_WORKERS,
+                    thread_name_prefix="recipe-image",
+                )
+
+    return _executor
+
+
+def variant_names(image_name):
+    """return the storage names of the thumbnail and webp variants"""
+    stem, extension = os.path.splitext(image_name)
+    return f"{stem}_thumb{extension}", f"{stem}.webp"
+
+
+def _encode(image, size, image_format, **options):
+    """return image resized to fit size and encoded as image_format"""
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def _save_variant(name, content):
+    """store a variant unless a file with that name already exists"""
+    if default_storage.exists(name):
+        return name
+
+    return default_storage.save(name, ContentFile(content))
+
+
+def generate_variants(recipe_id, image_name):
+    """build the thumbnail and webp variants of an image and record them"""
+    thumbnail_name, webp_name = variant_names(image_name)
+
+    with default_storage.open(image_name) as image_file:
+        image = Image.open(image_file)
+        image.load()
+
+    thumbnail_name = _save_variant(
+        thumbnail_name, _encode(image, THUMBNAIL_SIZE, image.format)
+    )
+    webp_name = _save_variant(
+        webp_name, _encode(image, WEBP_MAX_SIZE, "WEBP", quality=WEBP_QUALITY)
+    )
+
+    # skip the update when another upload replaced the image meanwhile
+    Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_thumbnail=thumbnail_name, image_webp=webp_name, updated_at=timezone.now(),
+    )
+
+
+def _run(recipe_id, image_name):
+    """worker entry point: never let an error escape into the pool"""
+    try:
+        generate_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception(
+            "Failed to process image %s of recipe %s", image_name, recipe_id
+        )
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe):
+    """generate variants of recipe.image once the upload is committed"""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if settings.RECIPE_IMAGE_PROCESS_EAGER:
+        generate_variants(recipe_id, image_name)
+        return
+
+    transaction.on_commit(lambda: get_executor().submit(_run, recipe_id, image_name))
@@ -0,0 +1,179 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.bulk import BATCH_SIZE, finish, write_relations
+from recipe.serializers import RecipeImportSerializer
+from recipe.sync import record_changes
+
+RELATIONS = (("tags", Tag), ("ingredients", Ingredient))
+
+
+def read_ndjson(lines):
+    """yield (line number, row) of a JSON lines file, skipping blank lines"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+
+
+def read_csv(lines):
+    """yield (line number, row) of a CSV file as written by the export"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        for relation, _ in RELATIONS:
+            names = row.get(relation) or ""
+            row[relation] = [name for name in names.split(";") if name]
+        yield reader.line_num, row
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+class ImportReport:
+    """what an import run did"""
+
+    def __init__(self):
+        self.created = 0
+        self.failed = []
+        self.started = time.monotonic()
+
+    def fail(self, line, errors):
+        self.failed.append({"line": line, "errors": errors})
+
+    @property
+    def seconds(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """imported rows per second"""
+        return self.created / self.seconds if self.seconds else 0.0
+
+    def as_dict(self, max_failures=None):
+        return {
+            "created": self.created,
+            "failed": len(self.failed),
+            "errors": self.failed[:max_failures],
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rate, 1),
+        }
+
+
+class RecipeImporter:
+    """
+    Import recipe rows for a user in batched transactions.
+
+    Tags and ingredients are matched by name through a name to id map that
+    is filled once per batch for the names it has not seen yet; missing
+    ones are created. A row that fails validation is reported and skipped.
+    A batch the database rejects is written again row by row, so only the
+    offending lines are reported, and the run goes on.
+    """
+
+    def __init__(self, user, batch_size=BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.ids = {relation: {} for relation, _ in RELATIONS}
+        self.report = ImportReport()
+
+    def run(self, rows, progress=None):
+        """import (line number, row) pairs, call progress after each batch"""
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+            if progress:
+                progress(self.report)
+
+        return self.report
+
+    def validate(self, batch):
+        """return (line number, data) of the valid rows, report the rest"""
+        valid = []
+        for line, row in batch:
+            if isinstance(row, Exception):
+                self.report.fail(line, {"non_field_errors": [str(row)]})
+                continue
+            if not isinstance(row, dict):
+                self.report.fail(line, {"non_field_errors": ["Expected an object."]})
+                continue
+            serializer = RecipeImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                self.report.fail(line, serializer.errors)
+
+        return valid
+
+    def resolve_names(self, relation, model, items):
+        """map every name of relation in items to an id, creating missing rows"""
+        known = self.ids[relation]
+        wanted = {name for item in items for name in item[relation]} - known.keys()
+        if not wanted:
+            return
+
+        # with duplicate names the oldest row wins
+        rows = model.objects.filter(user=self.user, name__in=wanted).order_by("-id")
+        known.update(rows.values_list("name", "id"))
+        missing = sorted(wanted - known.keys())
+        created = model.objects.bulk_create(
+            (model(user=self.user, name=name) for name in missing),
+            batch_size=self.batch_size,
+        )
+        known.update((row.name, row.pk) for row in created)
+        record_changes(
+            self.user.pk, model._meta.model_name, [row.pk for row in created]
+        )
+
+    def write(self, valid):
+        """create the recipes of (line number, data) pairs in one transaction"""
+        items = [dict(data) for _, data in valid]
+        with transaction.atomic():
+            for relation, model in RELATIONS:
+                self.resolve_names(relation, model, items)
+            for item in items:
+                for relation, _ in RELATIONS:
+                    item[relation] = [self.ids[relation][n] for n in item[relation]]
+
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    user=self.user,
+                    **{k: v for k, v in item.items() if k not in self.ids},
+                )
+                for item in items
+            )
+            recipe_ids = [recipe.pk for recipe in recipes]
+            write_relations(recipe_ids, items)
+            finish(self.user, recipe_ids)
+
+        self.report.created += len(recipe_ids)
+
+    def import_batch(self, batch):
+        valid = self.validate(batch)
+        if valid:
+            self.import_valid(valid)
+
+    def import_valid(self, valid):
+        """write valid rows, narrowing a database error down to its rows"""
+        try:
+            self.write(valid)
+        except DatabaseError as exc:
+            # ids created in the rolled back transaction are gone again
+            self.ids = {relation: {} for relation, _ in RELATIONS}
+            if len(valid) == 1:
+                line, _ = valid[0]
+                self.report.fail(line, {"non_field_errors": [str(exc).strip()]})
+                return
+            # retry each row in its own transaction or savepoint
+            for row in valid:
+                self.import_valid([row])
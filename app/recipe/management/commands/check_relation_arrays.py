@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Recipe
+from recipe.query import link_ids_sql
+
+RELATIONS = (("tags", "tag_ids"), ("ingredients", "ingredient_ids"))
+
+
+class Command(BaseCommand):
+    """Django command to compare Recipe id arrays with the link tables"""
+
+    help = "Check (and with --repair fix) Recipe.tag_ids and ingredient_ids"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair", action="store_true", help="recompute inconsistent rows"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="rows repaired per UPDATE"
+        )
+
+    def inconsistent_ids(self):
+        """return ids of recipes whose arrays differ from their links"""
+        mismatch = " OR ".join(
+            f"r.{column} IS DISTINCT FROM "
+            f"{link_ids_sql(Recipe._meta.get_field(relation))}"
+            for relation, column in RELATIONS
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT r.id FROM {Recipe._meta.db_table} r "
+                f"WHERE {mismatch} ORDER BY r.id"
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def repair(self, ids, batch_size):
+        """recompute the arrays of ids, the DB trigger fills them in"""
+        assignments = ", ".join(f"{column} = NULL" for _, column in RELATIONS)
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {Recipe._meta.db_table} SET {assignments} "
+                    f"WHERE id = ANY(%s)",
+                    [ids[start : start + batch_size]],
+                )
+
+    def handle(self, *args, **options):
+        ids = self.inconsistent_ids()
+        if not ids:
+            self.stdout.write(self.style.SUCCESS("Recipe id arrays are consistent."))
+            return
+
+        sample = ", ".join(str(pk) for pk in ids[:20])
+        self.stdout.write(
+            self.style.WARNING(f"{len(ids)} recipes out of sync: {sample}")
+        )
+        if not options["repair"]:
+            raise CommandError("Run with --repair to recompute them.")
+
+        self.repair(ids, options["batch_size"])
+        remaining = len(self.inconsistent_ids())
+        if remaining:
+            raise CommandError(f"{remaining} recipes still out of sync.")
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(ids)} recipes."))
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Tag, Ingredient
+from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet
+
+
+class Command(BaseCommand):
+    """Django command to EXPLAIN the querysets built by the recipe viewsets"""
+
+    help = "Run EXPLAIN on each recipe API list query and report sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--email", help="user whose data is queried (default: first user)"
+        )
+        parser.add_argument(
+            "--no-seqscan",
+            action="store_true",
+            help="discourage seq scans to check an index can serve each query",
+        )
+        parser.add_argument(
+            "--verbose-plan", action="store_true", help="print the full plan"
+        )
+
+    def get_user(self, email):
+        """return the user the queries are scoped to"""
+        users = get_user_model().objects.order_by("id")
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError("No user found to run the queries for.")
+
+        return user
+
+    def get_cases(self, user):
+        """return (name, viewset, query params) for each list query"""
+        tag_ids = ",".join(
+            str(pk)
+            for pk in Tag.objects.filter(user=user).values_list("id", flat=True)[:3]
+        )
+        ingredient_ids = ",".join(
+            str(pk)
+            for pk in Ingredient.objects.filter(user=user).values_list("id", flat=True)[
+                :3
+            ]
+        )
+
+        return [
+            ("tags", TagViewSet, {}),
+            ("tags assigned_only", TagViewSet, {"assigned_only": "1"}),
+            ("ingredients", IngredientViewSet, {}),
+            ("ingredients assigned_only", IngredientViewSet, {"assigned_only": "1"}),
+            ("recipes", RecipeViewSet, {}),
+            ("recipes by tags", RecipeViewSet, {"tags": tag_ids or "0"}),
+            (
+                "recipes by ingredients",
+                RecipeViewSet,
+                {"ingredients": ingredient_ids or "0"},
+            ),
+            (
+                "recipes with all tags",
+                RecipeViewSet,
+                {"tags": tag_ids or "0", "match": "all"},
+            ),
+            ("recipes search", RecipeViewSet, {"search": "curry"}),
+        ]
+
+    def build_queryset(self, viewset_class, user, params):
+        """return the list queryset a viewset builds for user and params"""
+        request = Request(APIRequestFactory().get("/", params))
+        request.user = user
+        view = viewset_class(action="list", request=request, format_kwarg=None)
+
+        return view.get_queryset()
+
+    def is_seq_scan(self, plan):
+        """check if a plan reads a table without an index"""
+        if connection.vendor == "postgresql":
+            return "Seq Scan" in plan
+
+        return any("SCAN" in line and "USING" not in line for line in plan.splitlines())
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["email"])
+        seq_scans = 0
+
+        with transaction.atomic():
+            if options["no_seqscan"] and connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, viewset_class, params in self.get_cases(user):
+                plan = self.build_queryset(viewset_class, user, params).explain()
+                if self.is_seq_scan(plan):
+                    seq_scans += 1
+                    self.stdout.write(self.style.WARNING(f"SEQ SCAN  {name}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"INDEXED   {name}"))
+
+                if options["verbose_plan"]:
+                    self.stdout.write(plan)
+
+        self.stdout.write(f"{seq_scans} queries fall back to sequential scans.")
@@ -0,0 +1,62 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipe.storage import referenced_images, release_images
+
+UPLOAD_DIR = "uploads/recipe"
+
+
+class Command(BaseCommand):
+    """Django command to delete recipe images no recipe points at"""
+
+    help = "Remove orphaned recipe image files from MEDIA_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=3600,
+            help="keep files younger than this many seconds (in-flight uploads)",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="only report what would go"
+        )
+
+    def stored_files(self):
+        """yield (storage name, absolute path) of every uploaded file"""
+        root = default_storage.path(UPLOAD_DIR)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, default_storage.path(""))
+                yield name.replace(os.sep, "/"), path
+
+    def handle(self, *args, **options):
+        referenced = referenced_images()
+        cutoff = time.time() - options["grace"]
+        removed = 0
+        freed = 0
+
+        for name, path in self.stored_files():
+            if name in referenced or os.path.getmtime(path) > cutoff:
+                continue
+
+            size = os.path.getsize(path)
+            if options["dry_run"]:
+                self.stdout.write(f"would remove {name}")
+            elif not release_images(name):
+                # referenced since the snapshot was taken
+                continue
+            removed += 1
+            freed += size
+
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {removed} orphaned files ({freed} bytes), "
+                f"{len(referenced)} referenced."
+            )
+        )
@@ -0,0 +1,58 @@
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.bulk import BATCH_SIZE
+from recipe.importer import READERS, RecipeImporter
+
+
+class Command(BaseCommand):
+    """Django command to import recipes from an NDJSON or CSV file"""
+
+    help = "Import recipes for a user, creating missing tags and ingredients"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, - for stdin")
+        parser.add_argument("--email", required=True, help="owner of the recipes")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="file format (default: from the file extension, else ndjson)",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}.")
+
+        path = options["path"]
+        file_format = options["format"]
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lstrip(".").lower()
+            file_format = extension if extension in READERS else "ndjson"
+
+        importer = RecipeImporter(user, batch_size=options["batch_size"])
+        if path == "-":
+            report = importer.run(READERS[file_format](sys.stdin), self.progress)
+        else:
+            with open(path, newline="", encoding="utf-8", errors="replace") as lines:
+                report = importer.run(READERS[file_format](lines), self.progress)
+
+        for failure in report.failed:
+            self.stderr.write(f"line {failure['line']}: {failure['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report.created} recipes in {report.seconds:.1f}s "
+                f"({report.rate:.0f} rows/s), {len(report.failed)} failed."
+            )
+        )
+
+    def progress(self, report):
+        self.stdout.write(
+            f"{report.created} imported, {len(report.failed)} failed, "
+            f"{report.rate:.0f} rows/s"
+        )
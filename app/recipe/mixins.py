@@ -0,0 +1,186 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, StreamingHttpResponse
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from recipe.cache import get_cache, normalize_params, response_cache_key
+from recipe.dbjson import stream_recipe_list
+from recipe.fast import fast_serializer
+from recipe.sync import latest_change
+
+
+class CachedListMixin:
+    """
+    Serve list responses from a per-user cache.
+
+    Entries are keyed on the user's cache version, which recipe.signals
+    bumps once a write to the user's tags, ingredients or recipes commits.
+    """
+
+    def cached_response(self, request, endpoint, build):
+        """return a cached response for endpoint or build and cache one"""
+        cache = get_cache()
+        key = response_cache_key(request, endpoint)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = build()
+        # streamed responses are not kept
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, response.data, settings.RECIPE_LIST_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            f"{self.basename}-list",
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs),
+        )
+
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match and If-Modified-Since on list and retrieve.
+
+    List ETags come from the user's change feed sequence, which every
+    write including deletes moves forward, so a 304 is sent without
+    loading, counting or serializing any rows. Lists carry no
+    Last-Modified, as no timestamp moves on deletes. Details use a small
+    aggregate over updated_at.
+    """
+
+    # nested relations whose updated_at also shows up in the detail view
+    detail_relations = ()
+
+    def make_etag(self, request, endpoint, *parts):
+        """return a strong ETag for a representation of endpoint"""
+        raw = ":".join(
+            str(part)
+            for part in (
+                request.user.pk,
+                endpoint,
+                request.accepted_renderer.format,
+                normalize_params(request.query_params),
+            )
+            + parts
+        )
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def conditional_response(self, request, etag, last_modified, build):
+        """return 304 when the client copy is current, else build()"""
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = build()
+
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    def collection_state(self, request):
+        """return the change feed sequence the user's lists derive from
+
+        The result only changes when the user's data does, so it is kept
+        in the per-user cache next to the responses themselves.
+        """
+        cache = get_cache()
+        key = response_cache_key(request, f"{self.basename}-state")
+        sequence = cache.get(key)
+        if sequence is None:
+            sequence = latest_change(request.user.pk)
+            cache.set(key, sequence, settings.RECIPE_LIST_CACHE_TIMEOUT)
+
+        return sequence
+
+    def list(self, request, *args, **kwargs):
+        etag = self.make_etag(request, "list", self.collection_state(request))
+        return self.conditional_response(
+            request,
+            etag,
+            None,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        aggregates = {"last_modified": Max("updated_at")}
+        for relation in self.detail_relations:
+            aggregates[relation] = Max(f"{relation}__updated_at")
+        try:
+            queryset = self.get_queryset().filter(**lookup)
+        except (TypeError, ValueError, ValidationError):
+            # a malformed lookup value, as in DRF's get_object_or_404
+            raise Http404
+        state = queryset.order_by().aggregate(**aggregates)
+
+        if state["last_modified"] is None:
+            # not found: let the regular path raise the 404
+            return super().retrieve(request, *args, **kwargs)
+
+        last_modified = max(value for value in state.values() if value is not None)
+        etag = self.make_etag(
+            request, f"detail:{kwargs}", *(state[key] for key in sorted(state))
+        )
+        return self.conditional_response(
+            request,
+            etag,
+            last_modified,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+
+class FastListMixin:
+    """
+    Render list actions through recipe.fast instead of the serializer.
+
+    Rows are read with values(), so no model instances or field objects
+    are built. Serializers the fast path cannot reproduce use the regular
+    list.
+    """
+
+    def list(self, request, *args, **kwargs):
+        fast = fast_serializer(self.get_serializer_class())
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.to_representation(page))
+
+        return Response(fast.to_representation(queryset))
+
+
+class DatabaseJSONListMixin:
+    """
+    Let the database render recipe lists with ?render=db.
+
+    Postgres builds every row as JSON and the rows are streamed as they
+    come off a server side cursor, so no model or dict is built in Python.
+    Requests with other params, e.g. search or pagination, use the regular
+    list.
+    """
+
+    db_render_params = ("render", "tags", "ingredients", "match")
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if (
+            params.get("render") != "db"
+            or not set(params) <= set(self.db_render_params)
+            or request.accepted_renderer.format != "json"
+        ):
+            return super().list(request, *args, **kwargs)
+
+        return StreamingHttpResponse(
+            stream_recipe_list(self.filtered_queryset()),
+            content_type="application/json",
+        )
@@ -0,0 +1,153 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination.
+
+    Lists are only paginated when the client sends `page_size` or `cursor`.
+    The cursor is an opaque token holding the ordering values of the last
+    row on the page, so the next page is a plain indexed range scan: no
+    OFFSET and no COUNT(*) are ever issued.
+    """
+
+    ordering = ("-id",)
+    page_size = 20
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def is_requested(self, request):
+        """check if the client opted in to pagination"""
+        params = request.query_params
+        return self.page_size_query_param in params or self.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """return one page of rows or None when not paginating"""
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, self.ordering_fields(queryset))
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        self.next_values = None
+        if self.has_next:
+            self.next_values = [self.row_value(rows[-1], f) for f in self.ordering]
+
+        return rows
+
+    def get_page_size(self, request):
+        """return the requested page size clamped to max_page_size"""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if size <= 0:
+            return self.page_size
+
+        return min(size, self.max_page_size)
+
+    def row_value(self, row, ordering_field):
+        """return the value of an ordering field for a model or values() row"""
+        name = ordering_field.lstrip("-")
+        if isinstance(row, dict):
+            return row[name]
+
+        return getattr(row, name)
+
+    def ordering_fields(self, queryset):
+        """return the model or annotation field behind each ordering entry"""
+        fields = []
+        for ordering_field in self.ordering:
+            name = ordering_field.lstrip("-")
+            try:
+                fields.append(queryset.model._meta.get_field(name))
+            except FieldDoesNotExist:
+                fields.append(queryset.query.annotations[name].output_field)
+
+        return fields
+
+    def after(self, values):
+        """build the filter selecting rows that sort after values"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        return condition
+
+    def encode_cursor(self, values):
+        """return an opaque url-safe token for ordering values"""
+        raw = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, request, fields):
+        """return ordering values from the cursor query param
+
+        Each value is converted by the field it is compared with, so a
+        forged cursor is rejected instead of failing inside the query.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+
+        return values
+
+    def get_next_link(self):
+        """return the url of the next page or None on the last page"""
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_values)
+        )
+
+    def get_paginated_response(self, data):
+        """wrap a page of data with the link to the next page"""
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from rest_framework import serializers
+
+
+def _concrete_sources(serializer, model):
+    """return the concrete model field names a serializer reads"""
+    names = [model._meta.pk.name]
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+        try:
+            model_field = model._meta.get_field(field.source.split(".")[0])
+        except FieldDoesNotExist:
+            continue
+        if model_field.concrete and not model_field.many_to_many:
+            if model_field.name not in names:
+                names.append(model_field.name)
+
+    return names
+
+
+def _related_queryset(field, related_model):
+    """return the narrowest queryset that can render a to-many field"""
+    child = getattr(field, "child", None)
+    pk = related_model._meta.pk.name
+    if isinstance(child, serializers.ModelSerializer):
+        only = _concrete_sources(child, related_model)
+    else:
+        only = [pk]
+
+    # a stable order, the same recipe.fast produces
+    return related_model.objects.only(*only).order_by(pk)
+
+
+def plan_queryset(queryset, serializer_class, extra_fields=()):
+    """
+    apply prefetch_related and only() to queryset so that serializer_class
+    can render every row without issuing per-row queries
+    """
+    model = queryset.model
+    serializer = serializer_class()
+    prefetches = []
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+        try:
+            model_field = model._meta.get_field(field.source.split(".")[0])
+        except FieldDoesNotExist:
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            related_qs = _related_queryset(field, model_field.related_model)
+            prefetches.append(Prefetch(field.source, queryset=related_qs))
+
+    only = _concrete_sources(serializer, model)
+    only.extend(name for name in extra_fields if name not in only)
+
+    return queryset.only(*only).prefetch_related(*prefetches)
+
+
+def relation_array(field):
+    """
+    return the column holding the ids of a to-many field as an array
+
+    None unless RECIPE_RELATION_ARRAYS is on and the model denormalizes
+    the relation, as Recipe does with tag_ids and ingredient_ids.
+    """
+    if not settings.RECIPE_RELATION_ARRAYS:
+        return None
+    try:
+        array = field.model._meta.get_field(
+            f"{field.related_model._meta.model_name}_ids"
+        )
+    except FieldDoesNotExist:
+        return None
+
+    return array.attname
+
+
+def link_ids_sql(field):
+    """return SQL for the sorted ids row r links to through field's table"""
+    through = field.remote_field.through._meta.db_table
+    own = field.m2m_column_name()
+    other = field.m2m_reverse_name()
+
+    return (
+        f"coalesce((SELECT array_agg(l.{other} ORDER BY l.{other}) "
+        f"FROM {through} l WHERE l.{own} = r.id), '{{}}'::integer[])"
+    )
+
+
+def filter_related(queryset, relation, ids, match="any"):
+    """
+    keep rows linked to any or to all of ids through a to-many relation
+
+    With an id array the match is an overlap or containment test on its
+    GIN index. Otherwise the relation is matched with a semi-join on its
+    through table, so rows never repeat, and "all" is a single GROUP BY
+    ... HAVING COUNT instead of one join per id.
+    """
+    field = queryset.model._meta.get_field(relation)
+    array = relation_array(field)
+    if array is not None:
+        lookup = "contains" if match == "all" else "overlap"
+        return queryset.filter(**{f"{array}__{lookup}": sorted(set(ids))})
+
+    through = field.remote_field.through
+    own = field.m2m_field_name()
+    other = f"{field.m2m_reverse_field_name()}_id"
+
+    links = through.objects.filter(**{f"{other}__in": ids})
+    if match == "all":
+        links = (
+            links.order_by()
+            .values(own)
+            .annotate(matched=Count(other))
+            .filter(matched=len(set(ids)))
+        )
+
+    return queryset.filter(pk__in=links.values(own))
+
+
+def filter_assigned(queryset):
+    """
+    keep tags or ingredients used by at least one recipe
+
+    A correlated EXISTS probes the through table index once per row instead
+    of joining every recipe link and de-duplicating the result.
+    """
+    relation = queryset.model._meta.get_field("recipe")
+    column = relation.field.m2m_reverse_field_name()
+    links = relation.through.objects.filter(**{column: OuterRef("pk")})
+
+    return queryset.annotate(assigned=Exists(links)).filter(assigned=True)
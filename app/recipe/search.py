@@ -0,0 +1,40 @@
+from functools import lru_cache
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast, Greatest
+
+# must match the configuration the triggers of migration core 0011 use
+SEARCH_CONFIG = "english"
+SEARCH_ORDERING = ("-rank", "-id")
+
+
+@lru_cache(maxsize=None)
+def trigram_available():
+    """check if pg_trgm is installed, it is optional"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search_recipes(queryset, terms):
+    """
+    Filter recipes matching terms and annotate them with a rank.
+
+    Matches come from the GIN indexed search_vector. With pg_trgm installed,
+    titles similar to terms match as well, so typos still find a recipe.
+    """
+    query = SearchQuery(terms, config=SEARCH_CONFIG)
+    rank = SearchRank(F("search_vector"), query)
+    condition = Q(search_vector=query)
+    if trigram_available():
+        rank = Greatest(rank, TrigramSimilarity("title", terms))
+        condition |= Q(title__trigram_similar=terms)
+
+    # double precision survives the keyset cursor round trip exactly
+    return queryset.annotate(rank=Cast(rank, FloatField())).filter(condition)
@@ -20,6 +20,22 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class TagUsageSerializer(TagSerializer):
+    """serializer for tag objects with their recipe count"""
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ("usage_count",)
+        read_only_fields = ("id", "usage_count")
+
+
+class IngredientUsageSerializer(IngredientSerializer):
+    """serializer for ingredient objects with their recipe count"""
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ("usage_count",)
+        read_only_fields = ("id", "usage_count")
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """serializer for recipe object"""
 
@@ -46,5 +62,57 @@ class RecipeImageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ("id", "image")
+        fields = ("id", "image", "image_thumbnail", "image_webp")
+        read_only_fields = ("id", "image_thumbnail", "image_webp")
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    """
+    Validate one recipe of a bulk request without touching the DB.
+
+    Tag and ingredient ids are checked for the whole batch by recipe.bulk.
+    """
+
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+
+    class Meta:
+        model = Recipe
+        fields = ("id", "title", "ingredients", "price", "time_minutes", "tags", "link")
         read_only_fields = ("id",)
+
+
+class RecipeBulkUpdateSerializer(RecipeBulkSerializer):
+    """Validate one partial recipe update of a bulk request"""
+
+    id = serializers.IntegerField()
+
+    def validate(self, attrs):
+        if "id" not in attrs:
+            raise serializers.ValidationError({"id": "This field is required."})
+
+        return attrs
+
+
+class NameListField(serializers.ListField):
+    """tag or ingredient names, also accepting {"name": ...} objects"""
+
+    child = serializers.CharField(max_length=255)
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            data = [
+                item.get("name") if isinstance(item, dict) else item for item in data
+            ]
+        return super().to_internal_value(data)
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    """Validate one row of a recipe import, relations given by name"""
+
+    ingredients = NameListField(required=False, default=list)
+    tags = NameListField(required=False, default=list)
+
+    class Meta:
+        model = Recipe
+        fields = ("title", "ingredients", "price", "time_minutes", "tags", "link")
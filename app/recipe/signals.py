@@ -0,0 +1,129 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Change, Tag, Ingredient, Recipe
+from recipe.cache import bump_user_version_on_commit
+from recipe.storage import IMAGE_FIELDS, release_images
+from recipe.sync import kind_of, record_changes
+
+M2M_ACTIONS = ("post_add", "post_remove", "post_clear")
+
+_local = threading.local()
+
+
+@contextmanager
+def muted():
+    """skip per row bookkeeping, for bulk writes that do it once per batch"""
+    previous = getattr(_local, "muted", False)
+    _local.muted = True
+    try:
+        yield
+    finally:
+        _local.muted = previous
+
+
+def unless_muted(handler):
+    """make a receiver do nothing inside muted()"""
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if not getattr(_local, "muted", False):
+            return handler(*args, **kwargs)
+
+    return wrapper
+
+
+def related_column(instance):
+    """return the through table column pointing at a tag or ingredient"""
+    return f"{instance._meta.model_name}_id"
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@unless_muted
+def invalidate_user_cache(sender, instance, **kwargs):
+    """a user's cached responses are stale once any of their rows changes"""
+    bump_user_version_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@unless_muted
+def record_save(sender, instance, **kwargs):
+    """put a saved row into its owner's change feed"""
+    record_changes(instance.user_id, kind_of(sender), [instance.pk])
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@unless_muted
+def record_delete(sender, instance, **kwargs):
+    """leave a tombstone for a deleted row"""
+    record_changes(instance.user_id, kind_of(sender), [instance.pk], Change.DELETE)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def drop_user_changes(sender, instance, **kwargs):
+    """tombstones written while a user's rows cascade away go with the user"""
+    Change.objects.filter(user_id=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@unless_muted
+def touch_recipes_on_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """adding or removing tags and ingredients changes the recipes"""
+    if action == "pre_clear" and reverse:
+        # the recipes losing this tag are gone from the relation afterwards
+        instance._cleared_recipe_ids = list(
+            sender.objects.filter(
+                **{related_column(instance): instance.pk}
+            ).values_list("recipe_id", flat=True)
+        )
+        return
+    if action not in M2M_ACTIONS:
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == "post_clear":
+        recipe_ids = getattr(instance, "_cleared_recipe_ids", [])
+    else:
+        recipe_ids = pk_set
+
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+    record_changes(instance.user_id, "recipe", recipe_ids)
+    bump_user_version_on_commit(instance.user_id)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+@unless_muted
+def touch_recipes_on_delete(sender, instance, **kwargs):
+    """deleting a tag or ingredient silently drops it from its recipes"""
+    relation = "tags" if sender is Tag else "ingredients"
+    recipes = Recipe.objects.filter(**{relation: instance})
+    recipe_ids = list(recipes.values_list("pk", flat=True))
+    recipes.update(updated_at=timezone.now())
+    record_changes(instance.user_id, "recipe", recipe_ids)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_recipe_images(sender, instance, **kwargs):
+    """delete image files the recipe was the last to use, once committed"""
+    names = [getattr(instance, field).name for field in IMAGE_FIELDS]
+    if any(names):
+        transaction.on_commit(lambda: release_images(*names))
@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+from django.db.models import Case, Count, IntegerField, Max, Min, Sum, Value, When
+
+from core.models import Recipe
+
+# lower bounds of the histogram buckets, the last one is open ended
+TIME_BUCKETS = (0, 15, 30, 60, 120)
+PRICE_BUCKETS = (0, 5, 10, 20, 50)
+CENT = Decimal("0.01")
+
+
+def _bucket(field, bounds):
+    """return an expression numbering the bucket a row falls in"""
+    return Case(
+        *(
+            When(**{f"{field}__lt": bound, "then": Value(index)})
+            for index, bound in enumerate(bounds[1:])
+        ),
+        default=Value(len(bounds) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def _histogram(bounds, counts):
+    """return buckets with their bounds and row counts"""
+    return [
+        {
+            "min": bound,
+            "max": bounds[index + 1] if index + 1 < len(bounds) else None,
+            "count": counts.get(index, 0),
+        }
+        for index, bound in enumerate(bounds)
+    ]
+
+
+def _money(value):
+    return str(value.quantize(CENT)) if value is not None else None
+
+
+def recipe_stats(queryset):
+    """
+    Aggregate price and time of recipes in the database.
+
+    One query groups the rows by (time bucket, price bucket); totals and
+    both histograms are summed up from that small grid. A second grouped
+    query returns per tag totals.
+    """
+    cells = (
+        queryset.order_by()
+        .annotate(
+            time_bucket=_bucket("time_minutes", TIME_BUCKETS),
+            price_bucket=_bucket("price", PRICE_BUCKETS),
+        )
+        .values("time_bucket", "price_bucket")
+        .annotate(
+            count=Count("pk"),
+            price_total=Sum("price"),
+            price_min=Min("price"),
+            price_max=Max("price"),
+            time_total=Sum("time_minutes"),
+            time_min=Min("time_minutes"),
+            time_max=Max("time_minutes"),
+        )
+    )
+
+    count = 0
+    price_total = Decimal(0)
+    time_total = 0
+    price_range = []
+    time_range = []
+    time_counts = {}
+    price_counts = {}
+    for cell in cells:
+        count += cell["count"]
+        price_total += cell["price_total"]
+        time_total += cell["time_total"]
+        price_range += [cell["price_min"], cell["price_max"]]
+        time_range += [cell["time_min"], cell["time_max"]]
+        time_counts[cell["time_bucket"]] = (
+            time_counts.get(cell["time_bucket"], 0) + cell["count"]
+        )
+        price_counts[cell["price_bucket"]] = (
+            price_counts.get(cell["price_bucket"], 0) + cell["count"]
+        )
+
+    through = Recipe.tags.through
+    tags = (
+        through.objects.filter(recipe_id__in=queryset.order_by().values("pk"))
+        .values("tag_id", "tag__name")
+        .annotate(count=Count("recipe_id"), price_total=Sum("recipe__price"))
+        .order_by("-count", "tag__name", "tag_id")
+    )
+
+    return {
+        "count": count,
+        "price": {
+            "total": _money(price_total),
+            "avg": _money(price_total / count) if count else None,
+            "min": _money(min(price_range, default=None)),
+            "max": _money(max(price_range, default=None)),
+        },
+        "time_minutes": {
+            "avg": round(time_total / count, 1) if count else None,
+            "min": min(time_range, default=None),
+            "max": max(time_range, default=None),
+        },
+        "histograms": {
+            "time_minutes": _histogram(TIME_BUCKETS, time_counts),
+            "price": _histogram(PRICE_BUCKETS, price_counts),
+        },
+        "tags": [
+            {
+                "id": row["tag_id"],
+                "name": row["tag__name"],
+                "count": row["count"],
+                "price_total": _money(row["price_total"]),
+            }
+            for row in tags
+        ],
+    }
@@ -0,0 +1,64 @@
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core.models import Recipe
+
+IMAGE_FIELDS = ("image", "image_thumbnail", "image_webp")
+# first key of the advisory locks taken on stored image names
+IMAGE_LOCK_NAMESPACE = 8008
+
+
+def lock_image(name):
+    """
+    lock a stored file name until the current transaction ends
+
+    Releasing a file and recording a new reference to it both hold this
+    lock, so a file is never deleted between an upload resolving to it and
+    the recipe that points at it being committed.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, hashtext(%s))",
+                [IMAGE_LOCK_NAMESPACE, name],
+            )
+
+
+def image_referenced(name):
+    """check if any recipe image field points at a stored file"""
+    query = Q()
+    for field in IMAGE_FIELDS:
+        query |= Q(**{field: name})
+
+    return Recipe.objects.filter(query).exists()
+
+
+def referenced_images():
+    """return the names of every stored file a recipe points at"""
+    names = set()
+    rows = Recipe.objects.values_list(*IMAGE_FIELDS).iterator(chunk_size=2000)
+    for row in rows:
+        names.update(name for name in row if name)
+
+    return names
+
+
+def release_images(*names):
+    """
+    delete stored files that no recipe points at anymore
+
+    References are checked again under each file's lock right before the
+    delete. Returns the names that were deleted.
+    """
+    released = []
+    for name in dict.fromkeys(names):
+        if not name:
+            continue
+        with transaction.atomic():
+            lock_image(name)
+            if not image_referenced(name):
+                default_storage.delete(name)
+                released.append(name)
+
+    return released
@@ -0,0 +1,80 @@
+from django.db import connection, transaction
+
+from core.models import Change, Tag, Ingredient, Recipe
+from recipe.fast import fast_serializer
+from recipe.serializers import TagSerializer, IngredientSerializer, RecipeSerializer
+
+# kind -> (model, serializer, key in the sync response)
+FEEDS = {
+    "tag": (Tag, TagSerializer, "tags"),
+    "ingredient": (Ingredient, IngredientSerializer, "ingredients"),
+    "recipe": (Recipe, RecipeSerializer, "recipes"),
+}
+
+
+def kind_of(model):
+    """return the change feed kind of a model"""
+    return model._meta.model_name
+
+
+def record_changes(user_id, kind, object_ids, action=Change.UPSERT):
+    """move objects to the head of their owner's change feed
+
+    Only the latest change of an object is kept, so the feed never grows
+    beyond one row per object ever created.
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # sequence numbers of one user are handed out in commit order,
+            # so a client never skips a change committed after its token
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [user_id])
+        Change.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        Change.objects.bulk_create(
+            Change(user_id=user_id, kind=kind, object_id=pk, action=action)
+            for pk in object_ids
+        )
+
+
+def latest_change(user_id):
+    """return the sequence number of a user's latest change, 0 if none"""
+    latest = (
+        Change.objects.filter(user_id=user_id)
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return latest or 0
+
+
+def changes_since(user, since, limit):
+    """return the sync response of changes after the since token"""
+    changes = list(
+        Change.objects.filter(user=user, id__gt=since).order_by("id")[: limit + 1]
+    )
+    more = len(changes) > limit
+    changes = changes[:limit]
+
+    data = {}
+    for kind, (model, serializer_class, key) in FEEDS.items():
+        ids = {Change.UPSERT: [], Change.DELETE: []}
+        for change in changes:
+            if change.kind == kind:
+                ids[change.action].append(change.object_id)
+
+        updated = []
+        if ids[Change.UPSERT]:
+            fast = fast_serializer(serializer_class)
+            queryset = model.objects.filter(user=user, pk__in=ids[Change.UPSERT])
+            updated = fast.to_representation(fast.values(queryset.order_by("id")))
+        data[key] = {"updated": updated, "deleted": ids[Change.DELETE]}
+
+    return {
+        "token": str(changes[-1].id if changes else since),
+        "more": more,
+        **data,
+    }
@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """assertions about how many queries a request issues"""
+
+    def count_queries(self, func, *args, **kwargs):
+        """return the number of queries func issues and its result"""
+        with CaptureQueriesContext(connection) as ctx:
+            result = func(*args, **kwargs)
+
+        return len(ctx.captured_queries), result
+
+    def assertConstantQueries(self, add_rows, request, sizes=(1, 10)):
+        """
+        check that request issues the same number of queries no matter
+        how many rows add_rows(n) has created beforehand
+        """
+        counts = []
+        for size in sizes:
+            add_rows(size)
+            count, _ = self.count_queries(request)
+            counts.append(count)
+
+        self.assertEqual(
+            len(set(counts)), 1, f"query count grew with rows: {counts} for {sizes}"
+        )
+
+
+class OnCommitMixin:
+    """run transaction.on_commit callbacks inside a TestCase"""
+
+    @contextmanager
+    def captureOnCommitCallbacks(self, using=DEFAULT_DB_ALIAS, execute=False):
+        """
+        collect the on_commit callbacks registered in the block, and run
+        them on exit with execute, like TestCase does from Django 3.2
+        """
+        callbacks = []
+        start = len(connections[using].run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            run_on_commit = connections[using].run_on_commit[start:]
+            callbacks[:] = [func for _, func in run_on_commit]
+            if execute:
+                for callback in callbacks:
+                    callback()
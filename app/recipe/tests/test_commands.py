@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.models import Tag, Ingredient, Recipe
+
+GC_MEDIA = "recipe.management.commands.gc_media"
+
+
+class ExplainQueriesCommandTest(TestCase):
+    """Test the explain_queries command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5.00
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+
+    def test_reports_every_list_query(self):
+        """every viewset list query gets a line in the report"""
+        out = StringIO()
+        call_command("explain_queries", "--no-seqscan", stdout=out)
+
+        output = out.getvalue()
+        for name in ("tags", "ingredients assigned_only", "recipes by tags"):
+            self.assertIn(name, output)
+        self.assertIn("queries fall back to sequential scans", output)
+
+    def test_unknown_user(self):
+        """a missing user is reported as a command error"""
+        with self.assertRaises(CommandError):
+            call_command("explain_queries", "--email", "nobody@test.com")
+
+
+class GcMediaCommandTest(TestCase):
+    """Test the gc_media command"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_removes_only_orphaned_files(self):
+        """files no recipe points at are deleted, referenced ones are kept"""
+        kept = default_storage.save("uploads/recipe/ab/kept.jpg", ContentFile(b"a"))
+        orphan = default_storage.save("uploads/recipe/cd/orphan.jpg", ContentFile(b"b"))
+        Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5.00, image=kept
+        )
+
+        out = StringIO()
+        call_command("gc_media", "--grace", "0", stdout=out)
+
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertIn("Removed 1 orphaned files", out.getvalue())
+
+    def test_references_are_checked_again_before_delete(self):
+        """a file referenced after the snapshot was taken is kept"""
+        name = default_storage.save("uploads/recipe/new.jpg", ContentFile(b"a"))
+        Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=10, price=5.00, image=name
+        )
+
+        with patch(f"{GC_MEDIA}.referenced_images", return_value=set()):
+            call_command("gc_media", "--grace", "0", stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+
+    def test_dry_run_keeps_files(self):
+        """a dry run only reports orphans"""
+        orphan = default_storage.save("uploads/recipe/orphan.jpg", ContentFile(b"b"))
+
+        call_command("gc_media", "--grace", "0", "--dry-run", stdout=StringIO())
+
+        self.assertTrue(os.path.exists(default_storage.path(orphan)))
+
+
+class ImportRecipesCommandTest(TestCase):
+    """Test the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as fileobj:
+            fileobj.write(content)
+        return path
+
+    def test_import_ndjson(self):
+        """rows are imported, tags matched by name and bad rows reported"""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        path = self.write(
+            "recipes.ndjson",
+            '{"title": "Curry", "price": "5.00", "time_minutes": 10, '
+            '"tags": ["Vegan", "Spicy"], "ingredients": ["Rice"]}\n'
+            '{"title": "Broken", "price": "abc", "time_minutes": 10}\n'
+            "not json\n"
+            '{"title": "Dal", "price": "4.00", "time_minutes": 20, '
+            '"tags": [{"id": 1, "name": "Vegan"}]}\n',
+        )
+        out, err = StringIO(), StringIO()
+
+        call_command(
+            "import_recipes", path, "--email", self.user.email, stdout=out, stderr=err
+        )
+
+        self.assertIn("Imported 2 recipes", out.getvalue())
+        self.assertIn("line 2:", err.getvalue())
+        self.assertIn("line 3:", err.getvalue())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.get().name, "Rice")
+        for recipe in Recipe.objects.all():
+            self.assertIn(vegan, recipe.tags.all())
+
+    def test_import_csv_in_batches(self):
+        """CSV rows are imported across batch boundaries"""
+        rows = "".join(f"Recipe {i},1.00,5,,Quick;Easy,Salt\n" for i in range(5))
+        path = self.write(
+            "recipes.csv", "title,price,time_minutes,link,tags,ingredients\n" + rows
+        )
+
+        call_command(
+            "import_recipes",
+            path,
+            "--email",
+            self.user.email,
+            "--batch-size",
+            "2",
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertEqual(Ingredient.objects.count(), 1)
+        self.assertEqual(Recipe.objects.first().tags.count(), 2)
+
+    def test_unknown_user(self):
+        """the owner must exist"""
+        with self.assertRaises(CommandError):
+            call_command("import_recipes", "-", "--email", "nobody@test.com")
+
+
+class CheckRelationArraysCommandTest(TestCase):
+    """Test the check_relation_arrays command"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.recipe = Recipe.objects.create(
+            user=user, title="Curry", time_minutes=10, price=5.00
+        )
+        self.tag = Tag.objects.create(user=user, name="Vegan")
+        self.recipe.tags.add(self.tag)
+
+    def break_arrays(self):
+        """empty the arrays behind the trigger's back"""
+        with connection.cursor() as cursor:
+            # deferred FK checks would block the ALTER TABLE
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute(
+                "ALTER TABLE core_recipe DISABLE TRIGGER core_recipe_relation_arrays"
+            )
+            cursor.execute("UPDATE core_recipe SET tag_ids = '{}'")
+            cursor.execute(
+                "ALTER TABLE core_recipe ENABLE TRIGGER core_recipe_relation_arrays"
+            )
+
+    def test_consistent(self):
+        out = StringIO()
+        call_command("check_relation_arrays", stdout=out)
+
+        self.assertIn("consistent", out.getvalue())
+
+    def test_check_and_repair(self):
+        """drift is an error until --repair recomputes the arrays"""
+        self.break_arrays()
+        with self.assertRaises(CommandError):
+            call_command("check_relation_arrays", stdout=StringIO())
+
+        out = StringIO()
+        call_command("check_relation_arrays", "--repair", stdout=out)
+
+        self.assertIn("Repaired 1 recipes", out.getvalue())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_ids, [self.tag.id])
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.fast import FastSerializer, fast_serializer
+from recipe.query import plan_queryset
+from recipe.serializers import (
+    TagSerializer,
+    TagUsageSerializer,
+    IngredientSerializer,
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    RecipeImageSerializer,
+)
+
+
+class FastSerializerTest(TestCase):
+    """Test the fast path renders the same JSON as the serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        tags = [Tag.objects.create(user=self.user, name=n) for n in ("b", "a", "Ü")]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=n) for n in ("Salt", "Oil")
+        ]
+        for i, price in enumerate(("5.00", "0.50", "999.99")):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe "{i}"',
+                time_minutes=i * 10,
+                price=price,
+                link="https://example.com" if i else "",
+            )
+            recipe.tags.add(*tags[i:])
+            recipe.ingredients.add(*ingredients[: i + 1])
+        Recipe.objects.create(user=self.user, title="Bare", time_minutes=1, price=1)
+
+    def assertSameJSON(self, serializer_class, queryset):
+        queryset = queryset.order_by("-id")
+        slow = serializer_class(
+            plan_queryset(queryset, serializer_class), many=True
+        ).data
+        fast = FastSerializer(serializer_class)
+        data = fast.to_representation(fast.values(queryset))
+
+        self.assertEqual(JSONRenderer().render(data), JSONRenderer().render(slow))
+
+    def test_equivalent_output(self):
+        """every list serializer is reproduced byte for byte"""
+        cases = (
+            (TagSerializer, Tag.objects.all()),
+            (TagUsageSerializer, Tag.objects.all()),
+            (IngredientSerializer, Ingredient.objects.all()),
+            (RecipeSerializer, Recipe.objects.all()),
+            (RecipeDetailSerializer, Recipe.objects.all()),
+        )
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer_class.__name__):
+                self.assertSameJSON(serializer_class, queryset)
+
+    def test_list_endpoints_use_fast_path(self):
+        """the list responses match the serializers"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        cases = (
+            ("recipe:tag-list", TagSerializer, Tag.objects.order_by("-name")),
+            ("recipe:recipe-list", RecipeSerializer, Recipe.objects.order_by("-id")),
+        )
+        for url, serializer_class, queryset in cases:
+            res = client.get(reverse(url))
+            slow = serializer_class(
+                plan_queryset(queryset, serializer_class), many=True
+            ).data
+            self.assertEqual(res.content, JSONRenderer().render(slow))
+
+    def test_unsupported_serializer(self):
+        """serializers with fields the fast path cannot copy fall back"""
+        self.assertIsNone(fast_serializer(RecipeImageSerializer))
@@ -1,10 +1,20 @@
+import base64
+import csv
+import io
+import json
 import os
 import tempfile
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 
 from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -12,10 +22,19 @@ from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
 
+from recipe.cache import get_cache, get_user_version
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.search import trigram_available
+from recipe.tests.helpers import OnCommitMixin, QueryCountMixin
+from recipe.storage import image_referenced
+from recipe.uploads import StoredUploadedFile
 
 
 RECIPE_URL = reverse("recipe:recipe-list")
+BULK_URL = reverse("recipe:recipe-bulk")
+EXPORT_URL = reverse("recipe:recipe-export")
+IMPORT_URL = reverse("recipe:recipe-import")
+STATS_URL = reverse("recipe:recipe-stats")
 
 
 def detail_url(recipe_id):
@@ -213,6 +232,869 @@ class PrivateRecipeTestAPI(TestCase):
         self.assertEqual(len(tags), 0)
 
 
+class RecipePaginationTest(TestCase):
+    """opt-in keyset pagination of recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            sample_recipe(user=self.user, title=f"Recipe {i}")
+
+    def test_list_unpaginated_by_default(self):
+        """without page_size or cursor the plain list is returned"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+
+    def test_walk_pages_with_cursor(self):
+        """following next links returns every recipe exactly once"""
+        seen = []
+        params = {"page_size": 2}
+        while params:
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data["results"]), 2)
+            seen.extend(recipe["id"] for recipe in res.data["results"])
+            params = None
+            if res.data["next"]:
+                params = parse_qs(urlparse(res.data["next"]).query)
+
+        expected = Recipe.objects.filter(user=self.user).order_by("-id")
+        self.assertEqual(seen, [recipe.id for recipe in expected])
+
+    def test_no_offset_or_count(self):
+        """a page is fetched without OFFSET or COUNT(*)"""
+        first = self.client.get(RECIPE_URL, {"page_size": 2})
+        params = parse_qs(urlparse(first.data["next"]).query)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPE_URL, params)
+
+        sql = " ".join(query["sql"].upper() for query in ctx.captured_queries)
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT(", sql)
+
+    def test_invalid_cursor(self):
+        """a tampered cursor is rejected"""
+        res = self.client.get(RECIPE_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_cursor(self):
+        """a well formed cursor holding values of the wrong type is rejected"""
+        for values in (["abc"], [{"a": 1}], [[1]], [None], [1, 2]):
+            raw = json.dumps(values).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+            res = self.client.get(RECIPE_URL, {"cursor": cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, values)
+
+    def test_forged_search_cursor(self):
+        """the rank in a search cursor is checked as a float"""
+        raw = json.dumps(["high", 1]).encode()
+        cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        res = self.client.get(RECIPE_URL, {"search": "curry", "cursor": cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeListCacheTest(OnCommitMixin, QueryCountMixin, TestCase):
+    """per-user caching of recipe lists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def test_repeat_list_is_served_from_cache(self):
+        """a repeated list call does not touch the database"""
+        first = self.client.get(RECIPE_URL)
+        count, second = self.count_queries(self.client.get, RECIPE_URL)
+
+        self.assertEqual(count, 0)
+        self.assertEqual(first.data, second.data)
+
+    def test_param_order_shares_cache_entry(self):
+        """id lists in a different order hit the same entry"""
+        tag1 = sample_tag(user=self.user, name="Vegan")
+        tag2 = sample_tag(user=self.user, name="Dessert")
+        self.client.get(RECIPE_URL, {"tags": f"{tag1.id},{tag2.id}"})
+
+        count, _ = self.count_queries(
+            self.client.get, RECIPE_URL, {"tags": f"{tag2.id},{tag1.id}"}
+        )
+
+        self.assertEqual(count, 0)
+
+    def test_version_is_bumped_on_commit(self):
+        """a read racing an open write cannot cache its data as current"""
+        before = get_user_version(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            sample_recipe(user=self.user, title="New")
+            self.recipe.tags.add(sample_tag(user=self.user))
+            self.assertEqual(get_user_version(self.user.pk), before)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_user_version(self.user.pk), before)
+
+    def test_write_invalidates_cache(self):
+        """creating a recipe shows up in the next list"""
+        self.client.get(RECIPE_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_recipe(user=self.user, title="New")
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_m2m_change_invalidates_cache(self):
+        """adding a tag to a recipe shows up in the next list"""
+        self.client.get(RECIPE_URL)
+        tag = sample_tag(user=self.user)
+        self.client.get(RECIPE_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]["tags"], [tag.id])
+
+    def test_cache_is_per_user(self):
+        """another user's cached list is never served"""
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user("other@test.com", "testpass")
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+
+class RecipeConditionalGetTest(OnCommitMixin, QueryCountMixin, TestCase):
+    """ETag and Last-Modified support on recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def test_list_not_modified(self):
+        """an unchanged list is answered with a bare 304"""
+        etag = self.client.get(RECIPE_URL)["ETag"]
+
+        count, res = self.count_queries(
+            self.client.get, RECIPE_URL, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(count, 0)
+
+    def test_list_etag_changes_on_write(self):
+        """adding, removing or retagging recipes changes the ETag"""
+        etags = {self.client.get(RECIPE_URL)["ETag"]}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = sample_recipe(user=self.user, title="Other")
+        etags.add(self.client.get(RECIPE_URL)["ETag"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.add(sample_tag(user=self.user))
+        etags.add(self.client.get(RECIPE_URL)["ETag"])
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        etags.add(self.client.get(RECIPE_URL)["ETag"])
+
+        self.assertEqual(len(etags), 4)
+
+    def test_list_if_modified_since_after_delete(self):
+        """lists carry no Last-Modified, a delete is never answered with 304"""
+        res = self.client.get(RECIPE_URL)
+        self.assertNotIn("Last-Modified", res)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        res = self.client.get(
+            RECIPE_URL, HTTP_IF_MODIFIED_SINCE="Sat, 01 Jan 2100 00:00:00 GMT"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_list_etag_depends_on_params(self):
+        """filtered lists have their own ETag"""
+        tag = sample_tag(user=self.user)
+        all_etag = self.client.get(RECIPE_URL)["ETag"]
+
+        res = self.client.get(
+            RECIPE_URL, {"tags": str(tag.id)}, HTTP_IF_NONE_MATCH=all_etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_etag_follows_nested_tags(self):
+        """renaming a tag changes the detail ETag of its recipe"""
+        tag = sample_tag(user=self.user)
+        self.recipe.tags.add(tag)
+        etag = self.client.get(detail_url(self.recipe.id))["ETag"]
+
+        tag.name = "Renamed"
+        tag.save()
+        res = self.client.get(detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["tags"][0]["name"], "Renamed")
+
+    def test_detail_not_modified(self):
+        """an unchanged recipe is answered with a bare 304"""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_of_other_user_is_404(self):
+        """validators are never computed for another user's recipe"""
+        other = get_user_model().objects.create_user("other@test.com", "testpass")
+        recipe = sample_recipe(user=other)
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_with_malformed_pk_is_404(self):
+        res = self.client.get(detail_url("abc"))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeQueryCountTest(OnCommitMixin, QueryCountMixin, TestCase):
+    """make sure recipe endpoints do not issue per-row queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client.force_authenticate(self.user)
+
+    def add_recipes(self, count):
+        """create recipes that each have a tag and an ingredient"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                recipe = sample_recipe(user=self.user, title=f"Recipe {i}")
+                recipe.tags.add(sample_tag(user=self.user, name=f"Tag {i}"))
+                recipe.ingredients.add(
+                    sample_ingredient(user=self.user, name=f"Ing {i}")
+                )
+
+    def test_list_query_count_is_constant(self):
+        """listing recipes does not query once per recipe"""
+        self.assertConstantQueries(
+            self.add_recipes, lambda: self.client.get(RECIPE_URL)
+        )
+
+    def test_detail_query_count_is_constant(self):
+        """recipe detail does not query once per tag or ingredient"""
+        recipe = sample_recipe(user=self.user)
+
+        def add_relations(count):
+            for i in range(count):
+                recipe.tags.add(sample_tag(user=self.user, name=f"Tag {i}"))
+                recipe.ingredients.add(
+                    sample_ingredient(user=self.user, name=f"Ing {i}")
+                )
+
+        self.assertConstantQueries(
+            add_relations, lambda: self.client.get(detail_url(recipe.id))
+        )
+
+    def test_planned_list_matches_serializer(self):
+        """the prefetched list renders the same data as a plain serializer"""
+        self.add_recipes(3)
+
+        res = self.client.get(RECIPE_URL)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by("-id")
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.data, serializer.data)
+
+
+class RecipeBulkTest(OnCommitMixin, QueryCountMixin, TestCase):
+    """Test the bulk recipe endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(self.user)
+        self.ingredient = sample_ingredient(self.user)
+
+    def payload(self, size):
+        return [
+            {
+                "title": f"Recipe {i}",
+                "time_minutes": 10,
+                "price": "5.00",
+                "tags": [self.tag.id],
+                "ingredients": [self.ingredient.id],
+            }
+            for i in range(size)
+        ]
+
+    def test_bulk_create(self):
+        """recipes and their relations are created in one request"""
+        res = self.client.post(BULK_URL, self.payload(3), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_query_count_is_constant(self):
+        """a bigger batch does not issue more queries"""
+        counts = [
+            self.count_queries(
+                self.client.post, BULK_URL, self.payload(size), format="json"
+            )[0]
+            for size in (1, 20)
+        ]
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_rejects_foreign_ids(self):
+        """ids of another user's tags fail the whole batch"""
+        other = get_user_model().objects.create_user("other@test.com", "testpass")
+        payload = self.payload(2)
+        payload[1]["tags"] = [sample_tag(other).id]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("tags", res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update(self):
+        """partial updates change only the given fields"""
+        first = sample_recipe(self.user, title="First")
+        second = sample_recipe(self.user, title="Second")
+        first.tags.add(self.tag)
+        self.client.get(RECIPE_URL)
+        new_tag = sample_tag(self.user, name="Dessert")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(
+                BULK_URL,
+                [
+                    {"id": first.id, "tags": [new_tag.id]},
+                    {"id": second.id, "title": "2"},
+                ],
+                format="json",
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, "First")
+        self.assertEqual(list(first.tags.all()), [new_tag])
+        self.assertEqual(second.title, "2")
+        titles = {recipe["title"] for recipe in self.client.get(RECIPE_URL).data}
+        self.assertEqual(titles, {"First", "2"})
+
+    def test_bulk_update_unknown_recipe(self):
+        """updating a recipe of another user fails"""
+        other = get_user_model().objects.create_user("other@test.com", "testpass")
+        recipe = sample_recipe(other)
+
+        res = self.client.patch(
+            BULK_URL, [{"id": recipe.id, "title": "Mine"}], format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Sample Recipe")
+
+    def test_bulk_delete(self):
+        """the given recipes are deleted"""
+        recipes = [sample_recipe(self.user) for _ in range(3)]
+        recipes[0].tags.add(self.tag)
+
+        res = self.client.delete(
+            BULK_URL, {"ids": [r.id for r in recipes[:2]]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Recipe.objects.all()), [recipes[2]])
+        sync = self.client.get(reverse("recipe:sync")).data
+        self.assertEqual(
+            sorted(sync["recipes"]["deleted"]), [r.id for r in recipes[:2]]
+        )
+
+
+class RecipeExportTest(QueryCountMixin, TestCase):
+    """Test the streaming recipe export"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_recipes(self, count):
+        tag = sample_tag(self.user, name="Vegan")
+        for _ in range(count):
+            recipe = sample_recipe(self.user)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(sample_ingredient(self.user))
+
+    def export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return b"".join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """each recipe is a JSON line shaped like the detail view"""
+        self.add_recipes(2)
+        sample_recipe(get_user_model().objects.create_user("o@test.com", "pass"))
+
+        lines = self.export().splitlines()
+
+        recipes = Recipe.objects.filter(user=self.user).order_by("id")
+        expected = RecipeDetailSerializer(recipes, many=True).data
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_export_csv(self):
+        """the CSV export has a header and one row per recipe"""
+        self.add_recipes(2)
+
+        rows = list(csv.DictReader(io.StringIO(self.export(output="csv"))))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["tags"], "Vegan")
+        self.assertEqual(rows[0]["price"], "5.00")
+
+    def test_export_in_chunks(self):
+        """relations are fetched per chunk and stay with their recipe"""
+        self.add_recipes(5)
+
+        with patch("recipe.export.CHUNK_SIZE", 2):
+            lines = self.export().splitlines()
+
+        self.assertEqual(len(lines), 5)
+        for line in lines:
+            self.assertEqual(len(json.loads(line)["ingredients"]), 1)
+
+    def test_export_query_count_is_constant(self):
+        """a single chunk costs the same queries for any number of recipes"""
+        self.assertConstantQueries(self.add_recipes, self.export)
+
+    def test_unknown_output(self):
+        """an unsupported output format is rejected"""
+        res = self.client.get(EXPORT_URL, {"output": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeImportTest(QueryCountMixin, TestCase):
+    """Test importing recipes through the API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name="recipes.ndjson"):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(IMPORT_URL, {"file": upload}, format="multipart")
+
+    def ndjson(self, count):
+        return "".join(
+            json.dumps(
+                {
+                    "title": f"Recipe {i}",
+                    "price": "5.00",
+                    "time_minutes": 10,
+                    "tags": ["Vegan"],
+                    "ingredients": ["Salt", "Rice"],
+                }
+            )
+            + "\n"
+            for i in range(count)
+        )
+
+    def test_import(self):
+        """recipes and their tags are created, failures are listed"""
+        res = self.upload(self.ndjson(2) + '{"title": ""}\n')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["created"], 2)
+        self.assertEqual(res.data["failed"], 1)
+        self.assertEqual(res.data["errors"][0]["line"], 3)
+        self.assertEqual(Tag.objects.get(user=self.user).name, "Vegan")
+        self.assertEqual(Recipe.objects.first().ingredients.count(), 2)
+
+    def test_export_round_trip(self):
+        """an export can be imported again"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(sample_tag(self.user))
+        exported = b"".join(self.client.get(EXPORT_URL).streaming_content).decode()
+
+        self.upload(exported)
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertEqual(Recipe.objects.last().tags.get().name, "Main Course")
+
+    def test_import_query_count_is_constant(self):
+        """a batch costs the same queries no matter how many rows it has"""
+        # the first import creates the tags and ingredients
+        self.upload(self.ndjson(1))
+        counts = [
+            self.count_queries(self.upload, self.ndjson(size))[0] for size in (2, 20)
+        ]
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_database_error_fails_only_its_rows(self):
+        """a batch the database rejects is retried row by row"""
+        with connection.cursor() as cursor:
+            # deferred FK checks would block the ALTER TABLE
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute(
+                "ALTER TABLE core_recipe ADD CONSTRAINT test_no_poison "
+                "CHECK (title <> 'Poison')"
+            )
+        rows = self.ndjson(2) + json.dumps(
+            {"title": "Poison", "price": "1.00", "time_minutes": 5, "tags": ["Bad"]}
+        )
+
+        res = self.upload(rows + "\n")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["created"], 2)
+        self.assertEqual(res.data["failed"], 1)
+        self.assertEqual(res.data["errors"][0]["line"], 3)
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertFalse(Tag.objects.filter(name="Bad").exists())
+
+    def test_file_required(self):
+        res = self.client.post(IMPORT_URL, {}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeFilterTest(TestCase):
+    """Test filtering recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(self.user, name="Vegan")
+        self.quick = sample_tag(self.user, name="Quick")
+        self.salt = sample_ingredient(self.user, name="Salt")
+        self.both = sample_recipe(self.user, title="Both")
+        self.both.tags.add(self.vegan, self.quick)
+        self.both.ingredients.add(self.salt)
+        self.vegan_only = sample_recipe(self.user, title="Vegan only")
+        self.vegan_only.tags.add(self.vegan)
+
+    def titles(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe["title"] for recipe in res.data]
+
+    def test_match_any_has_no_duplicates(self):
+        """a recipe with several of the tags is listed once"""
+        titles = self.titles({"tags": f"{self.vegan.id},{self.quick.id}"})
+
+        self.assertEqual(sorted(titles), ["Both", "Vegan only"])
+
+    def test_match_all(self):
+        """with match=all a recipe needs every listed tag"""
+        titles = self.titles(
+            {"tags": f"{self.vegan.id},{self.quick.id},{self.vegan.id}", "match": "all"}
+        )
+
+        self.assertEqual(titles, ["Both"])
+
+    def test_match_all_combines_relations(self):
+        """tag and ingredient filters both apply"""
+        titles = self.titles(
+            {"tags": f"{self.vegan.id}", "ingredients": f"{self.salt.id}"}
+        )
+
+        self.assertEqual(titles, ["Both"])
+
+    def test_invalid_filters_are_rejected(self):
+        """malformed or oversize id lists and unknown modes are a 400"""
+        too_many = ",".join(str(i) for i in range(1, 102))
+        for params in (
+            {"tags": "1,abc"},
+            {"ingredients": too_many},
+            {"tags": "1", "match": "some"},
+        ):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+@override_settings(RECIPE_RELATION_ARRAYS=True)
+class RecipeFilterArraysTest(RecipeFilterTest):
+    """Test filtering recipes on the denormalized id arrays"""
+
+
+class RecipeRelationArraysTest(TestCase):
+    """Test the tag and ingredient id arrays kept on recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [sample_tag(self.user, name=name) for name in ("A", "B", "C")]
+        self.salt = sample_ingredient(self.user, name="Salt")
+        self.recipe = sample_recipe(self.user)
+
+    def arrays(self, recipe):
+        return Recipe.objects.values_list("tag_ids", "ingredient_ids").get(pk=recipe.pk)
+
+    def test_arrays_follow_links(self):
+        """adding, removing and deleting related rows updates the arrays"""
+        a, b, c = self.tags
+        self.recipe.tags.add(c, a)
+        self.recipe.ingredients.add(self.salt)
+        self.assertEqual(self.arrays(self.recipe), ([a.id, c.id], [self.salt.id]))
+
+        self.recipe.tags.set([b])
+        c.delete()
+        self.salt.delete()
+        self.assertEqual(self.arrays(self.recipe), ([b.id], []))
+
+    def test_save_keeps_arrays(self):
+        """saving a recipe loaded before its links changed keeps them"""
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        self.recipe.tags.add(self.tags[0])
+
+        stale.title = "Renamed"
+        stale.save()
+
+        self.assertEqual(self.arrays(self.recipe), ([self.tags[0].id], []))
+
+    def test_lists_skip_link_tables(self):
+        """list payloads are unchanged and read no link table"""
+        self.recipe.tags.add(*self.tags)
+        self.recipe.ingredients.add(self.salt)
+        expected = self.client.get(RECIPE_URL, {"tags": self.tags[0].id}).data
+        get_cache().clear()
+
+        with override_settings(RECIPE_RELATION_ARRAYS=True):
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(RECIPE_URL, {"tags": self.tags[0].id})
+
+        self.assertEqual(res.data, expected)
+        self.assertEqual(res.data[0]["tags"], [tag.id for tag in self.tags])
+        sql = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertIn('"core_recipe"."tag_ids"', sql)
+        self.assertNotIn("core_recipe_tags", sql)
+
+
+class RecipeStatsTest(OnCommitMixin, QueryCountMixin, TestCase):
+    """Test the recipe statistics endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(self.user, name="Vegan")
+        for minutes, price in ((10, "4.00"), (20, "6.00"), (200, "60.50")):
+            recipe = sample_recipe(self.user, time_minutes=minutes, price=price)
+            if minutes < 100:
+                recipe.tags.add(self.tag)
+
+    def test_stats(self):
+        """totals, histograms and per tag totals are computed"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 3)
+        self.assertEqual(
+            res.data["price"],
+            {"total": "70.50", "avg": "23.50", "min": "4.00", "max": "60.50"},
+        )
+        self.assertEqual(res.data["time_minutes"], {"avg": 76.7, "min": 10, "max": 200})
+        time_counts = [b["count"] for b in res.data["histograms"]["time_minutes"]]
+        price_counts = [b["count"] for b in res.data["histograms"]["price"]]
+        self.assertEqual(time_counts, [1, 1, 0, 0, 1])
+        self.assertEqual(price_counts, [1, 1, 0, 0, 1])
+        self.assertEqual(
+            res.data["tags"],
+            [{"id": self.tag.id, "name": "Vegan", "count": 2, "price_total": "10.00"}],
+        )
+
+    def test_stats_use_list_filters(self):
+        """the tag filter of the list applies to the statistics"""
+        res = self.client.get(STATS_URL, {"tags": self.tag.id})
+
+        self.assertEqual(res.data["count"], 2)
+        self.assertEqual(res.data["price"]["max"], "6.00")
+
+        res = self.client.get(STATS_URL, {"search": "vegan"})
+        self.assertEqual(res.data["count"], 2)
+
+    def test_stats_are_cached_until_a_write(self):
+        """a repeat call is served from cache, a new recipe invalidates it"""
+        self.client.get(STATS_URL)
+        count, res = self.count_queries(self.client.get, STATS_URL)
+        self.assertEqual(count, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_recipe(self.user, price="1.00")
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data["count"], 4)
+
+    def test_empty_stats(self):
+        other = get_user_model().objects.create_user("other@test.com", "testpass")
+        self.client.force_authenticate(other)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["count"], 0)
+        self.assertIsNone(res.data["price"]["avg"])
+
+
+class RecipeDatabaseJSONTest(TestCase):
+    """Test recipe lists rendered by the database"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tag = sample_tag(self.user)
+        for title in ("Plain", 'Quotes "and" ünïcode'):
+            recipe = sample_recipe(self.user, title=title, link="https://x.org")
+            recipe.tags.add(tag)
+            recipe.ingredients.add(sample_ingredient(self.user, name=title))
+        sample_recipe(self.user, title="Bare")
+        sample_recipe(get_user_model().objects.create_user("o@test.com", "pass"))
+        self.tag = tag
+
+    def test_same_payload_as_orm(self):
+        """the streamed list equals the regular one"""
+        for params in ({}, {"tags": str(self.tag.id), "match": "all"}):
+            with self.subTest(params):
+                res = self.client.get(RECIPE_URL, {"render": "db", **params})
+                orm = self.client.get(RECIPE_URL, params)
+
+                self.assertTrue(res.streaming)
+                self.assertEqual(res["Content-Type"], "application/json")
+                content = b"".join(res.streaming_content)
+                self.assertEqual(json.loads(content), json.loads(orm.content))
+
+    def test_unsupported_params_fall_back(self):
+        """pagination and search go through the ORM path"""
+        for params in ({"page_size": 1}, {"search": "plain"}):
+            with self.subTest(params):
+                res = self.client.get(RECIPE_URL, {"render": "db", **params})
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertFalse(res.streaming)
+
+    def test_conditional_get(self):
+        """database rendered lists still carry validators"""
+        res = self.client.get(RECIPE_URL, {"render": "db"})
+
+        res = self.client.get(
+            RECIPE_URL, {"render": "db"}, HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(RECIPE_RELATION_ARRAYS=True)
+class RecipeDatabaseJSONArraysTest(RecipeDatabaseJSONTest):
+    """Test database rendered lists built from the id arrays"""
+
+
+class RecipeSearchTest(OnCommitMixin, TestCase):
+    """Test full text search of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, terms, **params):
+        res = self.client.get(RECIPE_URL, {"search": terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def titles(self, data):
+        return [recipe["title"] for recipe in data]
+
+    def test_search_title_tags_and_ingredients(self):
+        """recipes match on title, tag and ingredient names"""
+        curry = sample_recipe(self.user, title="Thai green curry")
+        stew = sample_recipe(self.user, title="Lentil stew")
+        stew.tags.add(sample_tag(self.user, name="Curries"))
+        salad = sample_recipe(self.user, title="Salad")
+        salad.ingredients.add(sample_ingredient(self.user, name="Curry powder"))
+        sample_recipe(self.user, title="Pancakes")
+
+        data = self.search("curry")
+
+        self.assertEqual(self.titles(data)[0], curry.title)
+        self.assertEqual(set(self.titles(data)), {curry.title, stew.title, "Salad"})
+
+    def test_search_follows_renames(self):
+        """renaming a tag or removing it updates the matching recipes"""
+        recipe = sample_recipe(self.user, title="Stew")
+        tag = sample_tag(self.user, name="Winter")
+        recipe.tags.add(tag)
+        self.assertEqual(self.titles(self.search("winter")), ["Stew"])
+
+        tag.name = "Summer"
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+        self.assertEqual(self.titles(self.search("winter")), [])
+        self.assertEqual(self.titles(self.search("summer")), ["Stew"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.clear()
+        self.assertEqual(self.titles(self.search("summer")), [])
+
+    def test_search_limited_to_user(self):
+        other = get_user_model().objects.create_user("other@test.com", "testpass")
+        sample_recipe(other, title="Curry")
+
+        self.assertEqual(self.search("curry"), [])
+
+    def test_search_paginates_by_rank(self):
+        """pages of search results continue in rank order"""
+        for i in range(3):
+            sample_recipe(self.user, title=f"Curry {i}")
+        sample_recipe(self.user, title="Curry curry special")
+
+        first = self.search("curry", page_size=2)
+        cursor = parse_qs(urlparse(first["next"]).query)["cursor"][0]
+        second = self.search("curry", page_size=2, cursor=cursor)
+
+        titles = self.titles(first["results"]) + self.titles(second["results"])
+        self.assertEqual(titles[0], "Curry curry special")
+        self.assertEqual(len(set(titles)), 4)
+
+    def test_search_tolerates_typos(self):
+        if not trigram_available():
+            self.skipTest("pg_trgm is not installed")
+        sample_recipe(self.user, title="Lasagne")
+
+        self.assertEqual(self.titles(self.search("lasagna")), ["Lasagne"])
+
+
 class RecipeImageUploadTest(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -221,6 +1103,9 @@ class RecipeImageUploadTest(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        self.recipe.image_thumbnail.delete()
+        self.recipe.image_webp.delete()
         self.recipe.image.delete()
 
     def upload_an_image(self):
@@ -237,6 +1122,196 @@ class RecipeImageUploadTest(TestCase):
         self.assertIn("image", res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    @override_settings(RECIPE_IMAGE_PROCESS_EAGER=True)
+    def test_upload_image_builds_variants(self):
+        """a thumbnail and a webp variant are recorded on the recipe"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (800, 400)).save(ntf, format="JPEG")
+            ntf.seek(0)
+            res = self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image_webp.name.endswith(".webp"))
+        with Image.open(self.recipe.image_thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 160))
+        with Image.open(self.recipe.image_webp.path) as webp:
+            self.assertEqual(webp.format, "WEBP")
+
+    def test_upload_is_streamed_to_storage(self):
+        """the stored image has the uploaded content and no leftovers"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".png") as ntf:
+            Image.new("RGB", (10, 10)).save(ntf, format="PNG")
+            ntf.seek(0)
+            content = ntf.read()
+            ntf.seek(0)
+            res = self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with open(self.recipe.image.path, "rb") as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(os.path.exists(self.recipe.image.path + ".part"))
+
+    def stored_files(self):
+        """return every file under the recipe upload directory"""
+        root = os.path.abspath(os.path.join(settings.MEDIA_ROOT, "uploads/recipe"))
+        return {
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(root)
+            for name in names
+        }
+
+    def test_extra_file_fields_are_not_stored(self):
+        """only the image part is written to storage"""
+        before = self.stored_files()
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".png") as ntf:
+            Image.new("RGB", (10, 10)).save(ntf, format="PNG")
+            ntf.seek(0)
+            extra = SimpleUploadedFile("extra.png", ntf.read())
+            ntf.seek(0)
+            res = self.client.post(
+                url, {"image": ntf, "other": extra}, format="multipart"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.stored_files() - before, {self.recipe.image.path})
+
+    def test_rejected_upload_leaves_no_files(self):
+        before = self.stored_files()
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            ntf.write(b"definitely not an image")
+            ntf.seek(0)
+            res = self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.stored_files(), before)
+
+    def test_failed_save_leaves_no_files(self):
+        """an error after streaming removes the stored upload"""
+        before = self.stored_files()
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".png") as ntf:
+            Image.new("RGB", (10, 10)).save(ntf, format="PNG")
+            ntf.seek(0)
+            with patch(
+                "recipe.views.RecipeViewSet.get_serializer", side_effect=RuntimeError
+            ):
+                with self.assertRaises(RuntimeError):
+                    self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.assertEqual(self.stored_files(), before)
+
+    def test_upload_rejects_non_image_header(self):
+        """a file that does not start with an image header is rejected"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            ntf.write(b"definitely not an image")
+            ntf.seek(0)
+            res = self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_rejects_oversize_image(self):
+        """an image above the size limit is rejected"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".png") as ntf:
+            Image.effect_noise((200, 200), 100).save(ntf, format="PNG")
+            ntf.seek(0)
+            res = self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_reference_check_uses_indexes(self):
+        """checking a stored file for references does not scan core_recipe"""
+        with CaptureQueriesContext(connection) as ctx:
+            image_referenced("uploads/recipe/missing.png")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + ctx.captured_queries[-1]["sql"])
+            plan = " ".join(row[0] for row in cursor.fetchall())
+
+        self.assertNotIn("Seq Scan", plan)
+        for index in ("image", "thumbnail", "webp"):
+            self.assertIn(f"core_recipe_{index}_idx", plan)
+
+    def test_deleting_recipe_releases_its_image(self):
+        """the image of a deleted recipe is removed once nothing uses it"""
+        self.upload_an_image()
+        path = self.recipe.image.path
+
+        with patch("recipe.signals.transaction.on_commit", lambda func: func()):
+            self.recipe.delete()
+
+        self.assertFalse(os.path.exists(path))
+        self.recipe = sample_recipe(user=self.user)
+
+    def test_claim_restores_a_released_blob(self):
+        """a shared blob deleted before the upload is saved is put back"""
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "blob.png")
+            spare = path + ".part"
+            with open(spare, "wb") as part:
+                part.write(b"image")
+            os.link(spare, path)
+            upload = StoredUploadedFile(
+                "blob.png", path, "image/png", 5, None, "digest", spare
+            )
+            # a concurrent release deletes the blob meanwhile
+            os.remove(path)
+
+            upload.claim()
+            upload.close()
+
+            with open(path, "rb") as stored:
+                self.assertEqual(stored.read(), b"image")
+            self.assertFalse(os.path.exists(spare))
+
+    @override_settings(RECIPE_IMAGE_CONTENT_ADDRESSED=True)
+    def test_identical_uploads_share_one_file(self):
+        """the same image uploaded to two recipes is stored once"""
+        other = sample_recipe(user=self.user, title="Other")
+        with tempfile.NamedTemporaryFile(suffix=".png") as ntf:
+            Image.new("RGB", (10, 10), "red").save(ntf, format="PNG")
+            for recipe in (self.recipe, other):
+                ntf.seek(0)
+                res = self.client.post(
+                    image_upload_url(recipe.id), {"image": ntf}, format="multipart"
+                )
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        digest = os.path.basename(other.image.name).split(".")[0]
+        self.assertEqual(len(digest), 64)
+        self.assertEqual(
+            os.listdir(os.path.dirname(other.image.path)), [digest + ".png"]
+        )
+
+        # replacing one recipe's image keeps the blob the other still uses
+        with tempfile.NamedTemporaryFile(suffix=".png") as ntf:
+            Image.new("RGB", (10, 10), "blue").save(ntf, format="PNG")
+            ntf.seek(0)
+            self.client.post(
+                image_upload_url(other.id), {"image": ntf}, format="multipart"
+            )
+        other.refresh_from_db()
+        self.assertNotEqual(other.image.name, self.recipe.image.name)
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        other.image.delete()
+
     def upload_bad_image(self):
         url = image_upload_url(self.recipe.id)
         res = self.client.post(url, {"image": "notimage"}, format="multipart")
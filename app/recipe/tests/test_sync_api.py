@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Tag, Ingredient, Recipe
+
+
+SYNC_URL = reverse("recipe:sync")
+
+
+def sample_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {"title": "Sample Recipe", "time_minutes": 10, "price": 5.00}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicSyncApiTest(TestCase):
+    """Test unauthenticated sync API access"""
+
+    def test_auth_required(self):
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTest(TestCase):
+    """Test the delta sync feed"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, **params):
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_sync(self):
+        """without a token every row of the user is returned"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(tag)
+        other = get_user_model().objects.create_user("other@test.com", "testpass")
+        Tag.objects.create(user=other, name="Fruity")
+
+        data = self.sync()
+
+        self.assertEqual(data["tags"]["updated"], [{"id": tag.id, "name": "Vegan"}])
+        self.assertEqual(data["ingredients"]["updated"][0]["id"], ingredient.id)
+        self.assertEqual(data["recipes"]["updated"][0]["tags"], [tag.id])
+        self.assertFalse(data["more"])
+
+    def test_only_changes_since_token(self):
+        """rows unchanged since the token are not sent again"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        Tag.objects.create(user=self.user, name="Dessert")
+        token = self.sync()["token"]
+
+        tag.name = "Vegetarian"
+        tag.save()
+        data = self.sync(since=token)
+
+        self.assertEqual(
+            data["tags"]["updated"], [{"id": tag.id, "name": "Vegetarian"}]
+        )
+        self.assertEqual(data["recipes"]["updated"], [])
+        self.assertEqual(self.sync(since=data["token"])["tags"]["updated"], [])
+
+    def test_deletes_leave_tombstones(self):
+        """deleted rows are reported and their recipes resent"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(tag)
+        token = self.sync()["token"]
+
+        tag_id = tag.id
+        tag.delete()
+        data = self.sync(since=token)
+
+        self.assertEqual(data["tags"]["deleted"], [tag_id])
+        self.assertEqual(data["recipes"]["updated"][0]["tags"], [])
+
+        recipe_id = recipe.id
+        recipe.delete()
+        data = self.sync(since=data["token"])
+        self.assertEqual(data["recipes"]["deleted"], [recipe_id])
+        self.assertEqual(data["recipes"]["updated"], [])
+
+    def test_limit_pages_through_changes(self):
+        """a limited sync says when more changes are pending"""
+        for name in ("a", "b", "c"):
+            Tag.objects.create(user=self.user, name=name)
+
+        first = self.sync(limit=2)
+        second = self.sync(since=first["token"], limit=2)
+
+        self.assertTrue(first["more"])
+        self.assertFalse(second["more"])
+        names = [
+            t["name"] for t in first["tags"]["updated"] + second["tags"]["updated"]
+        ]
+        self.assertEqual(names, ["a", "b", "c"])
+
+    def test_invalid_token(self):
+        """a malformed token is rejected"""
+        for since in ("abc", "-1"):
+            res = self.client.get(SYNC_URL, {"since": since})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(res.data, {"since": ["Expected a non-negative integer."]})
+
+    def test_deleted_user_leaves_no_changes(self):
+        """the cascade of a user delete does not leave tombstones behind"""
+        sample_recipe(self.user).tags.add(Tag.objects.create(user=self.user, name="a"))
+
+        self.user.delete()
+
+        self.assertFalse(Change.objects.exists())
@@ -1,3 +1,5 @@
+from urllib.parse import parse_qs, urlparse
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
@@ -117,3 +119,44 @@ class PrivateTagsAPITest(TestCase):
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_usage_count(self):
+        """the recipe count follows adds, removals and deletes"""
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        recipes = [
+            Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=2.00
+            )
+            for title in ("Pancake", "Porridge")
+        ]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        # a save of a stale instance does not overwrite the counter
+        tag.name = "Brunch"
+        tag.save()
+        recipes[0].delete()
+
+        res = self.client.get(TAGS_URL, {"usage_count": 1})
+
+        self.assertEqual(res.data, [{"id": tag.id, "name": "Brunch", "usage_count": 1}])
+        recipes[1].tags.clear()
+        tag.refresh_from_db()
+        self.assertEqual(tag.usage_count, 0)
+
+    def test_paginate_tags_by_name_then_id(self):
+        """tags with equal names are split across pages without repeats"""
+        for name in ["Vegan", "Dessert", "Vegan", "Curry", "Dessert"]:
+            Tag.objects.create(user=self.user, name=name)
+
+        seen = []
+        params = {"page_size": 2}
+        while True:
+            res = self.client.get(TAGS_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(res.data["results"])
+            if not res.data["next"]:
+                break
+            params = parse_qs(urlparse(res.data["next"]).query)
+
+        tags = Tag.objects.filter(user=self.user).order_by("-name", "-id")
+        self.assertEqual(seen, TagSerializer(tags, many=True).data)
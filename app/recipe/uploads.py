@@ -0,0 +1,199 @@
+import hashlib
+import os
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+from core.models import recipe_image_digest_path, recipe_image_file_path
+from recipe.storage import lock_image, release_images
+
+ALLOWED_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+SNIFF_SIZE = 16
+
+
+class ImageUploadRejected(MultiPartParserError):
+    """raised while streaming an upload that is not an acceptable image"""
+
+
+class StoredUploadedFile(UploadedFile):
+    """
+    an upload that was streamed straight to its final storage name
+
+    The streamed copy is kept next to it until the recipe pointing at the
+    stored file is committed, see claim().
+    """
+
+    def __init__(
+        self, storage_name, path, content_type, size, charset, content_hash, spare
+    ):
+        super().__init__(
+            open(path, "rb"),
+            os.path.basename(storage_name),
+            content_type,
+            size,
+            charset,
+        )
+        self.storage_name = storage_name
+        self.path = path
+        self.content_hash = content_hash
+        self.spare = spare
+
+    def temporary_file_path(self):
+        """let image validation open the stored file by path"""
+        return self.path
+
+    def claim(self):
+        """
+        lock the stored file for the current transaction and make sure it
+        exists, a shared blob may have been released since it was streamed
+        """
+        lock_image(self.storage_name)
+        if not os.path.exists(self.path):
+            os.replace(self.spare, self.path)
+
+    def close(self):
+        """close the file and drop the streamed copy"""
+        super().close()
+        if os.path.exists(self.spare):
+            os.remove(self.spare)
+
+    def discard(self):
+        """remove the stored file unless a recipe already shares it"""
+        self.close()
+        release_images(self.storage_name)
+
+
+def sniff_image_format(head):
+    """return the Pillow format whose header matches head, or None"""
+    Image.init()
+    for image_format in ALLOWED_FORMATS:
+        _, accept = Image.OPEN.get(image_format, (None, None))
+        result = accept(head) if accept else False
+        if result and not isinstance(result, (str, bytes)):
+            return image_format
+
+    return None
+
+
+class RecipeImageUploadHandler(FileUploadHandler):
+    """
+    Stream an uploaded recipe image straight to its final storage path.
+
+    Oversize payloads and data that does not start with a known image
+    header are rejected while streaming, and a sha256 of the content is
+    computed in the same pass. With RECIPE_IMAGE_CONTENT_ADDRESSED the
+    file is then named by its digest and stored only once.
+    """
+
+    chunk_size = 64 * 2 ** 10
+    field_name = "image"
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        self.destination = None
+        self.upload = None
+        self.skipping = False
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        """reject a request body that cannot fit under the limit"""
+        if content_length > self.max_size + self.chunk_size:
+            raise ImageUploadRejected(f"Upload is larger than {self.max_size} bytes.")
+
+    def new_file(self, field_name, *args, **kwargs):
+        """open the final storage path for the incoming image"""
+        super().new_file(field_name, *args, **kwargs)
+        # other file fields and repeated images are read and dropped
+        self.skipping = field_name != self.field_name or self.destination is not None
+        if self.skipping:
+            return
+
+        self.storage_name = default_storage.get_available_name(
+            recipe_image_file_path(None, self.file_name)
+        )
+        self.path = default_storage.path(self.storage_name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self.destination = open(self.path + ".part", "wb")
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def cleanup(self):
+        """remove everything this upload put on disk that no recipe uses"""
+        if self.upload is not None:
+            self.upload.discard()
+        elif self.destination is not None:
+            self.destination.close()
+            if os.path.exists(self.destination.name):
+                os.remove(self.destination.name)
+
+    def abort(self, message):
+        """drop the partial file and reject the upload"""
+        self.cleanup()
+        raise ImageUploadRejected(message)
+
+    def receive_data_chunk(self, raw_data, start):
+        """write a chunk through to disk, checking size and header"""
+        if self.skipping:
+            return None
+        if start == 0 and sniff_image_format(raw_data[:SNIFF_SIZE]) is None:
+            self.abort("Upload is not a supported image.")
+
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.abort(f"Upload is larger than {self.max_size} bytes.")
+
+        self.hash.update(raw_data)
+        try:
+            self.destination.write(raw_data)
+        except OSError:
+            self.cleanup()
+            raise
+
+    def file_complete(self, file_size):
+        """move the finished file into place and hand it to the view"""
+        if self.skipping:
+            return None
+
+        self.destination.close()
+        if not file_size:
+            self.abort("Upload is empty.")
+
+        try:
+            self.upload = self._store(file_size)
+        except OSError:
+            self.cleanup()
+            raise
+        return self.upload
+
+    def _store(self, file_size):
+        """link the streamed file under its storage name"""
+        content_hash = self.hash.hexdigest()
+        if settings.RECIPE_IMAGE_CONTENT_ADDRESSED:
+            extension = self.storage_name.split(".")[-1]
+            self.storage_name = recipe_image_digest_path(content_hash, extension)
+            self.path = default_storage.path(self.storage_name)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # the streamed copy stays as a spare until the upload is claimed
+        try:
+            os.link(self.destination.name, self.path)
+        except FileExistsError:
+            # the same content is already stored, keep the existing blob
+            pass
+
+        return StoredUploadedFile(
+            self.storage_name,
+            self.path,
+            self.content_type,
+            file_size,
+            self.charset,
+            content_hash,
+            self.destination.name,
+        )
@@ -11,5 +11,6 @@ router.register("recipes", views.RecipeViewSet)
 app_name = "recipe"
 
 urlpatterns = [
+    path("sync/", views.SyncView.as_view(), name="sync"),
     path("", include(router.urls)),
 ]
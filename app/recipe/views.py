@@ -1,27 +1,62 @@
+import io
+import os
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from core.authentication import CachedTokenAuthentication
 from core.models import Tag, Ingredient, Recipe
 
 from recipe.serializers import (
     TagSerializer,
+    TagUsageSerializer,
     IngredientSerializer,
+    IngredientUsageSerializer,
     RecipeSerializer,
     RecipeDetailSerializer,
     RecipeImageSerializer,
+    RecipeBulkSerializer,
+    RecipeBulkUpdateSerializer,
+)
+from recipe.bulk import create_recipes, update_recipes, delete_recipes
+from recipe.export import FORMATS, export_recipes
+from recipe.importer import READERS, RecipeImporter
+from recipe.images import schedule_variants, variant_names
+from recipe.mixins import (
+    CachedListMixin,
+    ConditionalGetMixin,
+    DatabaseJSONListMixin,
+    FastListMixin,
 )
+from recipe.pagination import KeysetPagination
+from recipe.search import SEARCH_ORDERING, search_recipes
+from recipe.stats import recipe_stats
+from recipe.query import filter_assigned, filter_related, plan_queryset
+from recipe.storage import release_images
+from recipe.sync import changes_since
+from recipe.uploads import RecipeImageUploadHandler, StoredUploadedFile
 
 
 class BaseRecipeAttr(
-    viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin
+    ConditionalGetMixin,
+    CachedListMixin,
+    FastListMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
 ):
     """Base class for recipe attributes like tags and ingredients"""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-name", "-id")
 
     def get_queryset(self):
         """return QS for current user only"""
@@ -29,9 +64,16 @@ class BaseRecipeAttr(
 
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = filter_assigned(queryset)
+
+        return queryset.filter(user=self.request.user).order_by("-name")
+
+    def get_serializer_class(self):
+        """add usage_count when the client asks for it"""
+        if self.request.query_params.get("usage_count"):
+            return self.usage_serializer_class
 
-        return queryset.filter(user=self.request.user).order_by("-name").distinct()
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """ create a new object"""
@@ -43,6 +85,7 @@ class TagViewSet(BaseRecipeAttr):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    usage_serializer_class = TagUsageSerializer
 
 
 class IngredientViewSet(BaseRecipeAttr):
@@ -50,35 +93,76 @@ class IngredientViewSet(BaseRecipeAttr):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    usage_serializer_class = IngredientUsageSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
+    DatabaseJSONListMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     """Manage recipes in DB"""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
+    pagination_class = KeysetPagination
+    detail_relations = ("tags", "ingredients")
+    bulk_max_size = 1000
+    max_filter_ids = 100
+    import_max_errors = 100
 
-    def _param_to_ints(self, qs):
-        """return a list of integer ids from string queryset"""
-        return [int(str_id) for str_id in qs.split(",")]
+    @property
+    def keyset_ordering(self):
+        """search results are ordered by rank"""
+        if self.request.query_params.get("search"):
+            return SEARCH_ORDERING
 
-    def get_queryset(self):
-        """return QS for current user only"""
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
+        return ("-id",)
+
+    def _param_to_ints(self, name):
+        """return the list of integer ids in a comma separated query param"""
+        value = self.request.query_params[name]
+        try:
+            ids = [int(str_id) for str_id in value.split(",")]
+        except ValueError:
+            raise ValidationError({name: ["Expected comma separated ids."]})
+        if len(ids) > self.max_filter_ids:
+            raise ValidationError(
+                {name: [f"At most {self.max_filter_ids} ids are allowed."]}
+            )
+
+        return ids
+
+    def filtered_queryset(self):
+        """return the user's recipes narrowed by the query params"""
+        params = self.request.query_params
+        match = params.get("match", "any")
+        if match not in ("any", "all"):
+            raise ValidationError({"match": ['Choose "any" or "all".']})
         queryset = self.queryset
 
-        if tags:
-            tag_ids = self._param_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+        for relation in ("tags", "ingredients"):
+            if params.get(relation):
+                ids = self._param_to_ints(relation)
+                queryset = filter_related(queryset, relation, ids, match)
+
+        queryset = queryset.filter(user=self.request.user)
+        if params.get("search"):
+            queryset = search_recipes(queryset, params["search"])
 
-        if ingredients:
-            ingredient_ids = self._param_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+        return queryset
 
-        return queryset.filter(user=self.request.user).order_by("-id")
+    def get_queryset(self):
+        """return QS for current user only"""
+        queryset = self.filtered_queryset().order_by(*self.keyset_ordering)
+
+        return plan_queryset(
+            queryset, self.get_serializer_class(), extra_fields=("user",)
+        )
 
     def get_serializer_class(self):
         """get serializer based on request"""
@@ -86,6 +170,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeDetailSerializer
         elif self.action == "upload_image":
             return RecipeImageSerializer
+        elif self.action == "bulk":
+            if self.request.method == "PATCH":
+                return RecipeBulkUpdateSerializer
+            return RecipeBulkSerializer
 
         return RecipeSerializer
 
@@ -93,14 +181,165 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """create a new recipe object"""
         serializer.save(user=self.request.user)
 
+    def _bulk_items(self, data):
+        """return the size checked list payload of a bulk request"""
+        if not isinstance(data, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of items."]})
+        if len(data) > self.bulk_max_size:
+            raise ValidationError(
+                {"non_field_errors": [f"At most {self.bulk_max_size} items."]}
+            )
+
+        return data
+
+    @action(methods=["POST", "PATCH", "DELETE"], detail=False)
+    def bulk(self, request):
+        """Create, update or delete many recipes in one transaction"""
+        if request.method == "DELETE":
+            ids = request.data.get("ids") if isinstance(request.data, dict) else None
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                raise ValidationError({"ids": ["Expected a list of recipe ids."]})
+            delete_recipes(request.user, self._bulk_items(ids))
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        partial = request.method == "PATCH"
+        serializer = self.get_serializer(
+            data=self._bulk_items(request.data), many=True, partial=partial
+        )
+        serializer.is_valid(raise_exception=True)
+        if partial:
+            recipe_ids = update_recipes(request.user, serializer.validated_data)
+        else:
+            recipe_ids = create_recipes(request.user, serializer.validated_data)
+
+        recipes = plan_queryset(
+            Recipe.objects.filter(pk__in=recipe_ids).order_by("id"), RecipeSerializer
+        )
+        return Response(
+            RecipeSerializer(recipes, many=True).data,
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED,
+        )
+
+    @action(methods=["GET"], detail=False)
+    def stats(self, request):
+        """Price and time statistics of the filtered recipes"""
+        return self.cached_response(
+            request,
+            "recipe-stats",
+            lambda: Response(recipe_stats(self.filtered_queryset())),
+        )
+
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """Stream the user's whole recipe book as NDJSON or CSV"""
+        output = request.query_params.get("output", "ndjson")
+        if output not in FORMATS:
+            raise ValidationError({"output": [f"Choose one of {sorted(FORMATS)}."]})
+
+        lines, content_type, extension = FORMATS[output]
+        response = StreamingHttpResponse(
+            lines(export_recipes(request.user)), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="recipes.{extension}"'
+        return response
+
+    @action(methods=["POST"], detail=False, url_path="import", url_name="import")
+    def import_file(self, request):
+        """Import recipes from an uploaded NDJSON or CSV file"""
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": ["No file was submitted."]})
+
+        extension = os.path.splitext(upload.name)[1].lstrip(".").lower()
+        read = READERS.get(extension, READERS["ndjson"])
+        lines = io.TextIOWrapper(
+            upload.file, encoding="utf-8", errors="replace", newline=""
+        )
+        report = RecipeImporter(request.user).run(read(lines))
+
+        return Response(
+            report.as_dict(max_failures=self.import_max_errors),
+            status=status.HTTP_201_CREATED if report.created else status.HTTP_200_OK,
+        )
+
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
         """Upload image to recipe"""
         recipe = self.get_object()
+        handler = RecipeImageUploadHandler(request)
+        request.upload_handlers = [handler]
+        try:
+            return self._save_image(request, recipe)
+        except Exception:
+            # rejected or interrupted uploads and failed saves leave no files
+            handler.cleanup()
+            raise
+
+    def _save_image(self, request, recipe):
+        """validate and record the uploaded image of recipe"""
         serializer = self.get_serializer(recipe, data=request.data)
+        upload = request.data.get("image")
+        stored = isinstance(upload, StoredUploadedFile)
 
         if serializer.is_valid():
-            serializer.save()
+            previous = [
+                recipe.image.name,
+                recipe.image_thumbnail.name,
+                recipe.image_webp.name,
+            ]
+            # a streamed upload is already in place, only record its name
+            image = (
+                upload.storage_name if stored else serializer.validated_data["image"]
+            )
+            # variants of the previous image are rebuilt in the background
+            with transaction.atomic():
+                if stored:
+                    upload.claim()
+                recipe = serializer.save(
+                    image=image, image_thumbnail=None, image_webp=None
+                )
+            if stored:
+                upload.close()
+            kept = {recipe.image.name, *variant_names(recipe.image.name)}
+            release_images(*(name for name in previous if name not in kept))
+            schedule_variants(recipe)
             return Response(serializer.data, status.HTTP_200_OK)
 
+        if stored:
+            upload.discard()
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+
+class SyncView(APIView):
+    """
+    Changes to the user's tags, ingredients and recipes since a sync token.
+
+    Omit since for a full sync. Keep the returned token and pass it back as
+    since; while more is true there are further changes to fetch.
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    page_size = 500
+    max_page_size = 5000
+
+    def _param_to_int(self, name, default):
+        """return a non negative integer query param"""
+        value = self.request.query_params.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            number = None
+        if number is None or number < 0:
+            raise ValidationError({name: ["Expected a non-negative integer."]})
+
+        return number
+
+    def get(self, request):
+        since = self._param_to_int("since", 0)
+        limit = self._param_to_int("limit", self.page_size)
+        limit = min(max(limit, 1), self.max_page_size)
+
+        return Response(changes_since(request.user, since, limit))
@@ -0,0 +1,143 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, get_token_cache
+
+
+ME_URL = reverse("user:me")
+
+
+class TokenCacheTest(TestCase):
+    """Test the token LRU on its own"""
+
+    def setUp(self):
+        self.shared = LocMemCache("token-cache-test", {})
+        self.shared.clear()
+
+    def test_evicts_least_recently_used(self):
+        cache = TokenCache(max_size=2, ttl=60, shared_cache=self.shared)
+        user = get_user_model()(pk=1)
+        cache.set("a", user)
+        cache.set("b", user)
+        cache.get("a")
+        cache.set("c", user)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("b"))
+        stats = cache.stats()
+        # a was still local, b came back from the shared tier
+        self.assertEqual((stats["hits"], stats["shared_hits"]), (2, 1))
+        self.assertEqual(stats["size"], 2)
+
+    def test_expired_entries_miss(self):
+        cache = TokenCache(max_size=2, ttl=-1, shared_cache=self.shared)
+        cache.set("a", get_user_model()(pk=1))
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_invalidation_reaches_other_workers(self):
+        """a user invalidated in one process misses in every other"""
+        user = get_user_model()(pk=1, email="test@test.com")
+        workers = [TokenCache(10, 60, self.shared, 0) for _ in range(2)]
+        for cache in workers:
+            cache.set("a", user)
+            self.assertIsNotNone(cache.get("a"))
+
+        workers[0].delete_user(1)
+
+        self.assertIsNone(workers[1].get("a"))
+
+    def test_hits_are_copies(self):
+        """requests never share or mutate the cached user"""
+        cache = TokenCache(10, 60, self.shared)
+        user = get_user_model()(pk=1, name="Before")
+        cache.set("a", user)
+        user.name = "Mutated"
+
+        first, second = cache.get("a"), cache.get("a")
+        first.name = "Changed"
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, "Before")
+
+    def test_version_is_checked_once_per_interval(self):
+        """local hits within the interval skip the shared cache"""
+        cache = TokenCache(10, 60, self.shared, version_check=60)
+        cache.set("a", get_user_model()(pk=1))
+
+        with patch.object(self.shared, "get", wraps=self.shared.get) as get:
+            for _ in range(3):
+                self.assertIsNotNone(cache.get("a"))
+
+        self.assertEqual(get.call_count, 0)
+        self.assertEqual(cache.stats()["hits"], 3)
+
+    def test_local_only(self):
+        """without a shared cache the LRU still serves hits"""
+        cache = TokenCache(10, 60)
+        cache.set("a", get_user_model()(pk=1))
+
+        self.assertIsNotNone(cache.get("a"))
+        cache.delete_user(1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """Test token authentication through the local cache"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="testpass", name="Test"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_second_request_skips_token_lookup(self):
+        """the token table is only queried on the first request"""
+        self.client.get(ME_URL)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        stats = get_token_cache().stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_deleted_token_is_rejected(self):
+        """deleting a token invalidates the cached entry"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """deactivating a user invalidates the cached entry"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(TOKEN_AUTH_CACHE={"SHARED_CACHE": "default"})
+class SharedTokenAuthenticationTest(CachedTokenAuthenticationTest):
+    """Test token authentication through the local and shared cache"""
@@ -1,22 +1,67 @@
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+COMMAND = "core.management.commands.wait_for_db.Command"
+
 
 class TestCommand(TestCase):
     def test_wait_for_db_ready(self):
-        """Mock db connection till its available"""
+        """The DB is queried once when it is available"""
         with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 1)
+            call_command("wait_for_db", stdout=StringIO())
+            cursor = gi.return_value.cursor.return_value.__enter__.return_value
+            cursor.execute.assert_called_once_with("SELECT 1")
 
     @patch("time.sleep", return_value=True)
     def test_wait_for_db(self, ts):
         """Mock DB wait"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 6)
+        with patch(f"{COMMAND}.check_db") as check_db:
+            check_db.side_effect = [OperationalError] * 5 + [None]
+            call_command("wait_for_db", stdout=StringIO())
+            self.assertEqual(check_db.call_count, 6)
+            self.assertEqual(ts.call_count, 5)
+
+    @patch("random.uniform", side_effect=lambda low, high: high)
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_db_backs_off(self, ts, uniform):
+        """The wait doubles after every failure up to the max interval"""
+        with patch(f"{COMMAND}.check_db") as check_db:
+            check_db.side_effect = [OperationalError] * 4 + [None]
+            call_command(
+                "wait_for_db",
+                "--interval",
+                "1",
+                "--max-interval",
+                "4",
+                stdout=StringIO(),
+            )
+
+        delays = [call[0][0] for call in ts.call_args_list]
+        self.assertEqual(delays, [1, 2, 4, 4])
+
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """The command fails once the timeout budget is spent"""
+        with patch(f"{COMMAND}.check_db", side_effect=OperationalError):
+            with self.assertRaises(CommandError):
+                call_command("wait_for_db", "--timeout", "0", stdout=StringIO())
+
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_migrations(self, ts):
+        """With --check-migrations the DB is not ready until migrated"""
+        with patch(f"{COMMAND}.check_db"), patch(
+            f"{COMMAND}.pending_migrations", side_effect=[["0001"], []]
+        ) as pending:
+            call_command("wait_for_db", "--check-migrations", stdout=StringIO())
+            self.assertEqual(pending.call_count, 2)
+
+    def test_wait_for_real_db(self):
+        """The test database is reachable and fully migrated"""
+        out = StringIO()
+        call_command("wait_for_db", "--check-migrations", stdout=out)
+        self.assertIn("DB Connected.", out.getvalue())
@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(TestCase):
+    """Test the connection pool with fake connections"""
+
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            conn = FakeConnection()
+            self.opened.append(conn)
+            return conn
+
+        kwargs.setdefault("check", lambda conn: conn.healthy)
+        return ConnectionPool(connect, **kwargs)
+
+    def test_reuses_returned_connections(self):
+        pool = self.make_pool(max_size=2)
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_warms_up_min_size(self):
+        pool = self.make_pool(min_size=2, max_size=4)
+        pool.getconn()
+
+        stats = pool.stats()
+        self.assertEqual((stats["size"], stats["idle"], stats["in_use"]), (2, 1, 1))
+
+    def test_unhealthy_connection_is_replaced(self):
+        pool = self.make_pool(max_size=1)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.healthy = False
+
+        new_conn = pool.getconn()
+
+        self.assertIsNot(new_conn, conn)
+        self.assertTrue(conn.closed)
+
+    def test_expired_connection_is_closed(self):
+        pool = self.make_pool(max_size=1, max_lifetime=-1)
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = self.make_pool(max_size=1, timeout=0)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()["timeouts"], 1)
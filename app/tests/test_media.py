@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+DIGEST = "ab" * 32
+
+
+class MediaServingTests(TestCase):
+    """Test serving uploaded media"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        default_storage.save("uploads/recipe/photo.jpg", ContentFile(b"0123456789"))
+        default_storage.save(f"uploads/recipe/ab/{DIGEST}.jpg", ContentFile(b"blob"))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_serves_file_with_validators(self):
+        res = self.client.get("/media/uploads/recipe/photo.jpg")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), b"0123456789")
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertIn("ETag", res)
+        self.assertIn("Last-Modified", res)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get("/media/uploads/recipe/photo.jpg")["ETag"]
+
+        res = self.client.get(
+            "/media/uploads/recipe/photo.jpg", HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range_request(self):
+        res = self.client.get("/media/uploads/recipe/photo.jpg", HTTP_RANGE="bytes=2-5")
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b"".join(res.streaming_content), b"2345")
+        self.assertEqual(res["Content-Range"], "bytes 2-5/10")
+
+    def test_unsatisfiable_range(self):
+        res = self.client.get("/media/uploads/recipe/photo.jpg", HTTP_RANGE="bytes=20-")
+
+        self.assertEqual(res.status_code, 416)
+
+    def test_content_addressed_file_is_immutable(self):
+        res = self.client.get(f"/media/uploads/recipe/ab/{DIGEST}.jpg")
+
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertEqual(res["ETag"], f'"{DIGEST}.jpg"')
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX="/protected/")
+    def test_accel_redirect_offload(self):
+        res = self.client.get("/media/uploads/recipe/photo.jpg")
+
+        self.assertEqual(res["X-Accel-Redirect"], "/protected/uploads/recipe/photo.jpg")
+        self.assertEqual(res.content, b"")
+
+    def test_path_traversal_is_rejected(self):
+        res = self.client.get("/media/../settings.py")
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_missing_file(self):
+        res = self.client.get("/media/uploads/recipe/missing.jpg")
+
+        self.assertEqual(res.status_code, 404)
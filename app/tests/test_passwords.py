@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.test import APIClient
+
+from core import passwords
+
+TOKEN_URL = reverse("user:token")
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass")
+
+    def login(self, password="testpass"):
+        return self.client.post(
+            TOKEN_URL, {"email": "test@test.com", "password": password}
+        )
+
+    def test_outdated_hash_is_replaced_on_login(self):
+        """a hash from a non preferred hasher is rehashed after a login"""
+        self.user.password = make_password("testpass", hasher="pbkdf2_sha1")
+        self.user.save()
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith(f"{get_hasher().algorithm}$"))
+        self.assertTrue(self.user.check_password("testpass"))
+
+    def test_failed_login_keeps_hash(self):
+        encoded = make_password("testpass", hasher="pbkdf2_sha1")
+        self.user.password = encoded
+        self.user.save()
+
+        res = self.login("wrongpass")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, encoded)
+
+    def test_hashing_runs_on_the_pool(self):
+        with patch.object(
+            passwords, "run_hashing", wraps=passwords.run_hashing
+        ) as run_hashing:
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        self.assertEqual(run_hashing.call_count, 1)
+
+    @override_settings(PASSWORD_HASH_WAIT=0.01)
+    def test_busy_pool(self):
+        """logins past the queue are answered with a 429"""
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with ThreadPoolExecutor(max_workers=1) as executor, patch.object(
+            passwords, "get_executor", return_value=(executor, slots)
+        ):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "1")
+
+    @override_settings(PASSWORD_HASH_WAIT=0.01)
+    def test_busy_pool_outside_the_api(self):
+        """a plain exception is raised when hashing outside the API"""
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with ThreadPoolExecutor(max_workers=1) as executor, patch.object(
+            passwords, "get_executor", return_value=(executor, slots)
+        ):
+            with self.assertRaises(passwords.HashingBusy) as ctx:
+                self.user.set_password("newpass")
+
+        self.assertNotIsInstance(ctx.exception, APIException)
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command("benchmark_logins", rounds=1, clients=2, stdout=out)
+
+        self.assertIn(get_hasher().algorithm, out.getvalue())
+        self.assertIn("logins/s", out.getvalue())
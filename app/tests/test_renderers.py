@@ -0,0 +1,105 @@
+import io
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import parsers, renderers
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+DATA = {
+    "id": 1,
+    "title": "Crème brûlée\u2028\u2029",
+    "price": Decimal("5.50"),
+    "created": datetime(2020, 1, 2, 3, 4, 5, 600000, tzinfo=timezone.utc),
+    "ingredients": [1, 2],
+    "tags": ({"id": 3, "name": "dessert"},),
+    "link": None,
+    "ratio": 0.1,
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_matches_json_renderer(self):
+        """The output is byte for byte what JSONRenderer produces"""
+        self.assertEqual(
+            FastJSONRenderer().render(DATA), JSONRenderer().render(DATA),
+        )
+        # DRF's encoder turns bare Decimals into floats
+        self.assertIn(b'"price":5.5,', FastJSONRenderer().render(DATA))
+
+    def test_indent_uses_stdlib(self):
+        """Indented output, as used by the browsable API, is unchanged"""
+        context = {"indent": 4}
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, renderer_context=context),
+            JSONRenderer().render(DATA, renderer_context=context),
+        )
+
+    def test_without_orjson(self):
+        """The stdlib encoder is used when orjson is not installed"""
+        with patch.object(renderers, "orjson", None):
+            self.assertEqual(
+                FastJSONRenderer().render(DATA), JSONRenderer().render(DATA)
+            )
+
+    def test_big_integer(self):
+        """Values orjson rejects are rendered by the stdlib encoder"""
+        data = {"id": 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), b'{"id":%d}' % 2 ** 70)
+
+    def test_exponent_floats(self):
+        """Floats written with an exponent are formatted like the stdlib"""
+        for value in (1e16, 1e-7, -2.5e20, Decimal("1E-9")):
+            data = {"ratios": [0.5, {"value": value}]}
+            self.assertEqual(
+                FastJSONRenderer().render(data), JSONRenderer().render(data)
+            )
+
+    def test_non_finite_floats(self):
+        """NaN and infinity raise like they do with JSONRenderer"""
+        for value in (float("nan"), float("inf"), float("-inf")):
+            data = {"ratios": [{"value": value}]}
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render(data)
+
+
+class FastJSONParserTests(SimpleTestCase):
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), "application/json", {})
+
+    def test_round_trip(self):
+        """Parsed bodies match JSONParser"""
+        body = JSONRenderer().render(DATA)
+        self.assertEqual(
+            self.parse(FastJSONParser(), body), self.parse(JSONParser(), body)
+        )
+
+    def test_invalid_body(self):
+        """Malformed JSON is a ParseError"""
+        for body in (b"{", b"", b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                self.parse(FastJSONParser(), body)
+
+    def test_without_orjson(self):
+        """The stdlib parser is used when orjson is not installed"""
+        with patch.object(parsers, "orjson", None):
+            self.assertEqual(self.parse(FastJSONParser(), b'{"a": [1]}'), {"a": [1]})
+
+
+class BenchmarkRenderersCommandTests(SimpleTestCase):
+    def test_benchmark(self):
+        """The benchmark reports every renderer it compares"""
+        out = StringIO()
+        call_command("benchmark_renderers", count=10, repeat=1, stdout=out)
+        self.assertIn("json (stdlib)", out.getvalue())
+        self.assertIn("json (fast)", out.getvalue())
@@ -0,0 +1,26 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from core.versions import bump_version, get_version
+
+
+class VersionTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("versions-test", {})
+        self.cache.clear()
+
+    def test_bump(self):
+        """a bump moves the version forward"""
+        before = get_version(self.cache, "test:", 1)
+        bump_version(self.cache, "test:", 1)
+
+        self.assertGreater(get_version(self.cache, "test:", 1), before)
+
+    def test_bump_after_eviction(self):
+        """an evicted counter is seeded again instead of failing"""
+        before = get_version(self.cache, "test:", 1)
+        self.cache.clear()
+
+        bump_version(self.cache, "test:", 1)
+
+        self.assertGreaterEqual(get_version(self.cache, "test:", 1), before)